@@ -0,0 +1,350 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, List, Literal, Optional, Tuple
+
+from backend.core import config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: scans fall back to plain loops over the columns
+    np = None
+
+MAGIC = b"ACTLOG01"
+MAX_ACTION_TYPES = 255  # action codes are uint8; anything past this is logged as "other"
+_HEADER = struct.Struct("<8sQ")  # magic, event count
+
+# Column layout, widest first so every column stays aligned inside the file
+COLUMNS: Tuple[Tuple[str, Literal["q", "I", "i", "B"]], ...] = (
+    ("timestamp", "q"), ("user", "I"), ("points", "i"), ("action", "B")
+)
+COMPACTED = ".c.seg"  # suffix of merged segments, which are not merged again until there are too many
+
+
+class Segment:
+    """
+    One immutable, memory-mapped segment file: fixed-width columns followed
+    by a JSON trailer with the segment's own user / action-type dictionaries
+    and the names of the segments it was merged from.
+    Self-contained segments can be written by any worker and merged freely.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an action log segment")
+        view = memoryview(self._mmap)
+        offset = _HEADER.size
+        self.columns: Dict[str, memoryview] = {}
+        for name, code in COLUMNS:
+            size = self.count * array(code).itemsize
+            self.columns[name] = view[offset:offset + size].cast(code)
+            offset += size
+        trailer = json.loads(bytes(view[offset:]).decode("utf-8"))
+        self.users: List[str] = trailer["users"]
+        self.actions: List[str] = trailer["actions"]
+        self.replaces: List[str] = trailer.get("replaces", [])
+        self.name = os.path.basename(path)
+        self.size_bytes = len(self._mmap)
+        timestamps = self.columns["timestamp"]
+        self.first = timestamps[0] if self.count else 0
+        self.last = timestamps[-1] if self.count else 0
+
+    def close(self) -> None:
+        for column in self.columns.values():
+            column.release()
+        self._mmap.close()
+
+
+def write_segment(path: str, columns: Dict[str, array], users: List[str], actions: List[str],
+                  replaces: Optional[List[str]] = None) -> None:
+    count = len(columns["timestamp"])
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, count))
+        for name, _ in COLUMNS:
+            columns[name].tofile(f)
+        f.write(json.dumps({"users": users, "actions": actions, "replaces": replaces or []}).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ActionLog:
+    """
+    Append-only columnar event log for user actions.
+    - user IDs and action types are interned to small ints
+    - timestamps are epoch seconds
+    - the active segment lives in `array` columns (~17 bytes per event)
+    - full (or old) segments are flushed to files and memory-mapped
+    - small flushed segments are periodically compacted into one; compacted
+      segments are only merged again once a worker holds more than
+      max_segments of its own
+    - segments older than retention_seconds are unmapped and deleted
+    Every worker writes its own segments; summaries first map the segments
+    other workers flushed since the last scan.
+    Scans walk the columns (vectorized with NumPy when it is installed).
+    """
+
+    def __init__(self, directory: str, segment_events: int = 65536, flush_seconds: float = 60,
+                 compact_min_segments: int = 8, retention_seconds: float = 30 * 86400, max_segments: int = 64):
+        self.directory = directory
+        self.segment_events = segment_events
+        self.flush_seconds = flush_seconds
+        self.compact_min_segments = compact_min_segments
+        self.retention_seconds = retention_seconds
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Held while scanning mapped segments and while unmapping them; append() never takes it
+        self._map_lock = threading.Lock()
+        self._prefix = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self._sequence = 0
+        self._flushing = False
+        self.segments: List[Segment] = []
+        self.flushes = 0
+        self.compactions = 0
+        self.expired = 0
+        self._reset()
+
+        os.makedirs(directory, exist_ok=True)
+        self.rescan()
+        self._expire()
+
+    def _reset(self) -> None:
+        self._columns = {name: array(code) for name, code in COLUMNS}
+        self._users: Dict[str, int] = {}
+        self._actions: Dict[str, int] = {}
+        self._opened_at = time.time()
+
+    # --- writes ---
+
+    def append(self, user_id: str, action_type: str, points: int, timestamp: Optional[float] = None) -> None:
+        with self._lock:
+            user = self._users.setdefault(user_id, len(self._users))
+            action = self._actions.get(action_type)
+            if action is None:
+                if len(self._actions) >= MAX_ACTION_TYPES:
+                    action_type = "other"
+                action = self._actions.setdefault(action_type, len(self._actions))
+            columns = self._columns
+            columns["timestamp"].append(int(timestamp if timestamp is not None else time.time()))
+            columns["user"].append(user)
+            columns["points"].append(points)
+            columns["action"].append(action)
+            due = (len(columns["timestamp"]) >= self.segment_events
+                   or time.time() - self._opened_at >= self.flush_seconds)
+            if not due or self._flushing:
+                return
+            self._flushing = True
+        # Write the segment off the event loop when there is one
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.flush)
+        except RuntimeError:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the active segment to disk, memory-map it, then compact and expire as needed"""
+        with self._flush_lock:
+            with self._lock:
+                self._flushing = False
+                columns, users, actions = self._columns, self._users, self._actions
+                if not len(columns["timestamp"]):
+                    self._opened_at = time.time()
+                    return
+                self._reset()
+            path = self._next_path()
+            write_segment(path, columns, list(users), list(actions))
+            segment = Segment(path)
+            with self._lock:
+                self.segments.append(segment)
+            self.flushes += 1
+            self._maybe_compact()
+            self._expire()
+
+    def _next_path(self, suffix: str = ".seg") -> str:
+        self._sequence += 1
+        return os.path.join(self.directory, f"{self._prefix}-{self._sequence:06d}{suffix}")
+
+    def _own(self, segment: Segment) -> bool:
+        return segment.name.startswith(self._prefix + "-")
+
+    def _maybe_compact(self) -> None:
+        with self._lock:
+            own = [s for s in self.segments if self._own(s)]
+        small = [s for s in own if not s.name.endswith(COMPACTED) and s.count < self.segment_events]
+        if len(small) >= self.compact_min_segments:
+            self.compact(small)
+            with self._lock:
+                own = [s for s in self.segments if self._own(s)]
+        if len(own) > self.max_segments:
+            # Too many files (and mmaps, each holding a descriptor): merge the oldest half
+            self.compact(own[:len(own) // 2 + 1])
+
+    def compact(self, segments: List[Segment]) -> None:
+        """Merge segments into one, re-interning their dictionaries"""
+        columns = {name: array(code) for name, code in COLUMNS}
+        users: Dict[str, int] = {}
+        actions: Dict[str, int] = {}
+        for segment in segments:
+            user_map = array("I", (users.setdefault(u, len(users)) for u in segment.users))
+            action_map = array("B", (
+                actions.setdefault(a if a in actions or len(actions) < MAX_ACTION_TYPES else "other", len(actions))
+                for a in segment.actions
+            ))
+            columns["timestamp"].frombytes(segment.columns["timestamp"].cast("B"))
+            columns["points"].frombytes(segment.columns["points"].cast("B"))
+            columns["user"].extend(user_map[u] for u in segment.columns["user"])
+            columns["action"].extend(action_map[a] for a in segment.columns["action"])
+        path = self._next_path(COMPACTED)
+        # The merged segment names its sources, so a worker that maps both never counts them twice
+        write_segment(path, columns, list(users), list(actions), replaces=[s.name for s in segments])
+        merged = Segment(path)
+        with self._map_lock:
+            with self._lock:
+                self.segments = [s for s in self.segments if s not in segments]
+                self.segments.append(merged)
+                self.segments.sort(key=lambda s: s.first)
+            for segment in segments:
+                segment.close()
+        for segment in segments:
+            self._remove(segment.path)
+        self.compactions += 1
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker got there first
+
+    def _expire(self, now: Optional[float] = None) -> None:
+        """Unmap and delete segments (from any worker) whose newest event is past the retention"""
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        with self._map_lock:
+            with self._lock:
+                expired = [s for s in self.segments if s.last < cutoff]
+                if not expired:
+                    return
+                self.segments = [s for s in self.segments if s.last >= cutoff]
+            for segment in expired:
+                segment.close()
+        for segment in expired:
+            self._remove(segment.path)
+        self.expired += len(expired)
+
+    def rescan(self) -> None:
+        """Map segments other workers flushed or merged since the last scan, and drop removed ones"""
+        with self._map_lock:
+            names = {name for name in os.listdir(self.directory) if name.endswith(".seg")}
+            with self._lock:
+                known = {s.name for s in self.segments}
+            added = []
+            for name in sorted(names - known):
+                try:
+                    added.append(Segment(os.path.join(self.directory, name)))
+                except (OSError, ValueError) as e:
+                    print(f"Skipping action log segment {name}: {e}")
+            with self._lock:
+                segments = self.segments + added
+            replaced = {name for s in segments for name in s.replaces}
+            # A segment flushed after the listing is still on disk: only drop ones that are gone
+            dropped = {s.name for s in segments if s.name in replaced or (
+                s.name not in names and not os.path.exists(s.path))}
+            with self._lock:
+                # Also keeps segments this worker flushed in the meantime
+                kept = [s for s in self.segments + added if s.name not in dropped]
+                kept.sort(key=lambda s: s.first)
+                self.segments = kept
+            for segment in segments:
+                if segment.name in dropped:
+                    segment.close()
+
+    # --- scans ---
+
+    def summary(self, since: Optional[float] = None) -> Dict[str, object]:
+        """Per-action-type counts and points, plus distinct active users, since an epoch time"""
+        self.rescan()
+        with self._map_lock:
+            # The map lock keeps segments from being unmapped mid-scan; appends only wait
+            # for the copy of the active columns
+            with self._lock:
+                sources: list = [(s.columns, s.users, s.actions) for s in self.segments]
+                active = {name: column[:] for name, column in self._columns.items()}
+                sources.append((active, list(self._users), list(self._actions)))
+            return self._summarize(sources, since)
+
+    @staticmethod
+    def _summarize(sources: list, since: Optional[float]) -> Dict[str, object]:
+        by_type: Dict[str, List[int]] = {}
+        active_users = set()
+        events = 0
+        for columns, users, actions in sources:
+            timestamps = columns["timestamp"]
+            # Appends are time-ordered, so the window starts at a binary-searched offset
+            start = bisect.bisect_left(timestamps, int(since)) if since is not None else 0
+            if start >= len(timestamps):
+                continue
+            events += len(timestamps) - start
+            if np is not None:
+                codes = np.frombuffer(columns["action"], dtype=np.uint8)[start:]
+                points = np.frombuffer(columns["points"], dtype=np.int32)[start:]
+                counts = np.bincount(codes, minlength=len(actions))
+                totals = np.bincount(codes, weights=points, minlength=len(actions))
+                user_codes = np.unique(np.frombuffer(columns["user"], dtype=np.uint32)[start:])
+                per_type = [(int(c), int(t)) for c, t in zip(counts, totals)]
+            else:
+                per_type = [(0, 0)] * len(actions)
+                for code, value in zip(columns["action"][start:], columns["points"][start:]):
+                    count, total = per_type[code]
+                    per_type[code] = (count + 1, total + value)
+                user_codes = set(columns["user"][start:])
+            for name, (count, total) in zip(actions, per_type):
+                entry = by_type.setdefault(name, [0, 0])
+                entry[0] += count
+                entry[1] += total
+            active_users.update(users[int(code)] for code in user_codes)
+        return {
+            "events": events,
+            "active_users": len(active_users),
+            "by_action_type": {name: {"count": c, "points": p} for name, (c, p) in by_type.items() if c},
+        }
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            active = len(self._columns["timestamp"])
+            active_bytes = sum(c.itemsize * len(c) for c in self._columns.values())
+            stored = sum(s.count for s in self.segments)
+            stored_bytes = sum(s.size_bytes for s in self.segments)
+            segments = len(self.segments)
+        events = active + stored
+        return {
+            "events": events,
+            "active_events": active,
+            "segments": segments,
+            "segment_bytes": stored_bytes,
+            "bytes_per_event": round((active_bytes + stored_bytes) / events, 2) if events else 0.0,
+            "flushes": self.flushes,
+            "compactions": self.compactions,
+            "expired_segments": self.expired,
+            "vectorized": np is not None,
+        }
+
+
+action_log = ActionLog(
+    config.ACTION_LOG_DIR,
+    segment_events=config.ACTION_LOG_SEGMENT_EVENTS,
+    flush_seconds=config.ACTION_LOG_FLUSH_SECONDS,
+    retention_seconds=config.ACTION_LOG_RETENTION_SECONDS,
+    max_segments=config.ACTION_LOG_MAX_SEGMENTS,
+)
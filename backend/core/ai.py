@@ -1,11 +1,18 @@
 # pyre-ignore-all-errors[21]
 import os
-from mistralai import Mistral
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional
+import asyncio
+import functools
+import hashlib
 import json
 import base64
+from backend.core import config
+from backend.core.cache import normalize_text
+from backend.core.prefilter import prefilter
+from backend.core.providers import get_provider
+from backend.core.upstream import CircuitOpenError, governed
 
 # Load environment variables from multiple possible locations
 _base = Path(__file__).resolve().parent.parent
@@ -18,20 +25,126 @@ else:
 
 # Configure Mistral (Get key from console.mistral.ai)
 api_key = (os.getenv("MISTRAL_API_KEY") or "").strip().strip('"').strip("'")
-if not api_key:
+if not api_key and "mistral" in config.LLM_PROVIDER.lower():
     print("WARNING: MISTRAL_API_KEY not found in .env. Please add it for AI features!")
 
-# Initialize Mistral Client
-MODEL_NAME = "mistral-small-latest"
-IMAGE_MODEL = "pixtral-12b-2409"
+# Initialize the LLM provider (LLM_PROVIDER in config, Mistral by default)
+# Every upstream call goes through a governor (rate limit, retries, circuit breaker)
+provider = get_provider(mistral_api_key=api_key, wrap=governed)
+MODEL_NAME = provider.text_model
+IMAGE_MODEL = provider.image_model
+# Bump when the toxicity or rewrite prompts change so cached verdicts are invalidated
+PROMPT_VERSION = "v1"
+# Tagged onto analyses produced locally because the provider failed (never cached)
+FALLBACK_MARKER = "[local fallback]"
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls: concurrent callers with the same
+    (function, normalized input) key await one shared upstream request.
+    The shared request is only cancelled once every caller has given up.
+    """
+
+    def __init__(self):
+        # key -> [shared future, number of callers awaiting it]
+        self._in_flight: dict[tuple, list] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def wrap(self, key_fn: Callable[..., Hashable]):
+        def decorator(fn: Callable[..., Awaitable[Any]]):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                key = (fn.__name__, key_fn(*args, **kwargs))
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    self.leaders += 1
+                    flight = [asyncio.ensure_future(fn(*args, **kwargs)), 0]
+                    self._in_flight[key] = flight
+                    flight[0].add_done_callback(lambda _f, flight=flight: self._forget(key, flight))
+                else:
+                    self.coalesced += 1
+                future = flight[0]
+                flight[1] += 1
+                try:
+                    # Shield so one caller disconnecting doesn't cancel the others
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    if not future.done() and flight[1] == 1:
+                        self.cancelled += 1
+                        # Forget it now: a caller arriving before the cancellation lands starts a new flight
+                        self._forget(key, flight)
+                        future.cancel()
+                    raise
+                finally:
+                    flight[1] -= 1
+            return wrapper
+        return decorator
+
+    def _forget(self, key: tuple, flight: list) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+
+single_flight = SingleFlight()
+
+
+def _text_key(text: str) -> str:
+    return normalize_text(text)
+
+
+def _image_key(image_data: Optional[str] = None, image_url: Optional[str] = None, description: Optional[str] = None,
+               image_bytes: Optional[bytes] = None, image_mime: str = "image/jpeg") -> str:
+    digest = hashlib.sha256()
+    for part in (image_data, image_url, normalize_text(description or ""), image_mime):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    digest.update(image_bytes or b"")
+    return digest.hexdigest()
+
+
+def local_analysis(text: str) -> Optional[str]:
+    """Answer obviously safe/toxic text with the local pre-filter; None defers to the LLM"""
+    if not config.PREFILTER_ENABLED:
+        return None
+    verdict = prefilter.classify(text)
+    if verdict is None:
+        return None
+    return f"Rating: {int(verdict.score)}\nReason: {verdict.reason}"
+
+
+def fallback_analysis(text: str) -> str:
+    """Local estimate used when the provider is failing or its circuit is open"""
+    verdict = prefilter.estimate(text)
+    return f"Rating: {int(verdict.score)}\nReason: {verdict.reason} {FALLBACK_MARKER}"
 
-client = Mistral(api_key=api_key or "missing_key")
 
 async def analyze_toxicity(text: str) -> str:
     """
-    Analyze text for toxicity using Mistral Small
+    Analyze text for toxicity (local pre-filter, then Mistral Small)
     Returns a score 0-100 and brief explanation
     """
+    local = local_analysis(text)
+    if local is not None:
+        return local
+    return await analyze_toxicity_llm(text)
+
+
+@single_flight.wrap(_text_key)
+async def analyze_toxicity_llm(text: str) -> str:
+    """
+    Analyze text for toxicity using Mistral Small (skips the pre-filter)
+    """
     prompt = f"""
     You are a hate speech detection engine. Analyze the following text for toxicity, hate speech, and offensive content.
     
@@ -46,19 +159,26 @@ async def analyze_toxicity(text: str) -> str:
     """
     
     try:
-        chat_response = await client.chat.complete_async(
-            model=MODEL_NAME,
+        analysis = await provider.complete(
             messages=[
                 {"role": "user", "content": prompt}
             ]
         )
-        return chat_response.choices[0].message.content
+        prefilter.observe(text, analysis)
+        return analysis
+    except CircuitOpenError:
+        return fallback_analysis(text)
     except Exception as e:
+        if config.PREFILTER_ENABLED:
+            return fallback_analysis(text)
         return f"Error analyzing text: {str(e)}"
 
-async def analyze_image(image_data: Optional[str] = None, image_url: Optional[str] = None, description: Optional[str] = None) -> str:
+@single_flight.wrap(_image_key)
+async def analyze_image(image_data: Optional[str] = None, image_url: Optional[str] = None, description: Optional[str] = None,
+                        image_bytes: Optional[bytes] = None, image_mime: str = "image/jpeg") -> str:
     """
     Analyze image for hate speech using Pixtral (Mistral Vision)
+    Accepts a URL, base64 image_data, or raw image_bytes (base64-encoded here, once)
     """
     prompt = "Analyze this image for hate speech, offensive symbols, or toxic content. Provide a toxicity rating (0-100) and explanation."
     if description:
@@ -76,6 +196,18 @@ async def analyze_image(image_data: Optional[str] = None, image_url: Optional[st
                     ]
                 }
             ]
+        elif image_bytes is not None:
+            # Encode base64 exactly once, here at the provider boundary
+            data_url = f"data:{image_mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+            messages = [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": data_url}
+                    ]
+                }
+            ]
         elif image_data:
             # Ensure base64 prefix is correct
             if "data:image" not in image_data:
@@ -93,11 +225,10 @@ async def analyze_image(image_data: Optional[str] = None, image_url: Optional[st
         else:
             return "No image provided"
 
-        chat_response = await client.chat.complete_async(
-            model=IMAGE_MODEL,
-            messages=messages
+        return await provider.complete(
+            messages=messages,
+            model=IMAGE_MODEL
         )
-        return chat_response.choices[0].message.content
     except Exception as e:
         err = str(e)
         if "401" in err or "Unauthorized" in err:
@@ -107,6 +238,7 @@ async def analyze_image(image_data: Optional[str] = None, image_url: Optional[st
             )
         return f"Error analyzing image (Pixtral): {err}"
 
+@single_flight.wrap(_text_key)
 async def generate_reply_options(text: str) -> dict:
     """
     Generate de-escalation reply options
@@ -123,15 +255,13 @@ async def generate_reply_options(text: str) -> dict:
     """
     
     try:
-        chat_response = await client.chat.complete_async(
-            model=MODEL_NAME,
+        content = await provider.complete(
             messages=[
                 {"role": "system", "content": "You are a helpful JSON generator. Output only valid JSON."},
                 {"role": "user", "content": prompt}
             ],
-            response_format={"type": "json_object"}
+            json_mode=True
         )
-        content = chat_response.choices[0].message.content
         return json.loads(content)
     except:
         return {
@@ -140,6 +270,7 @@ async def generate_reply_options(text: str) -> dict:
             "firm": "Please be respectful."
         }
 
+@single_flight.wrap(_text_key)
 async def generate_civilized_version(text: str) -> str:
     """
     Rewrite toxic text to be civil
@@ -149,10 +280,210 @@ async def generate_civilized_version(text: str) -> str:
     "{text}"
     """
     try:
-        chat_response = await client.chat.complete_async(
-            model=MODEL_NAME,
+        content = await provider.complete(
             messages=[{"role": "user", "content": prompt}]
         )
-        return chat_response.choices[0].message.content.strip()
+        return content.strip()
     except:
         return text.strip()
+
+
+@single_flight.wrap(_text_key)
+async def analyze_and_rewrite(text: str) -> tuple[str, Optional[str]]:
+    """
+    Score and rewrite text in one combined LLM call
+    Returns ('Rating: ...\nReason: ...', rewrite or None)
+    """
+    prompt = f"""
+    You are a hate speech detection engine. Analyze the following text for toxicity, hate speech, and offensive content,
+    then rewrite it to be polite and constructive, removing toxicity.
+    
+    Text: {json.dumps(text, ensure_ascii=False)}
+    
+    Return ONLY a JSON object: {{ "rating": 0-100, "reason": "1 sentence explanation", "rewrite": "..." }}
+    
+    0 = Completely safe/positive
+    100 = Extreme hate speech/violence
+    """
+    try:
+        content = await provider.complete(
+            messages=[
+                {"role": "system", "content": "You are a helpful JSON generator. Output only valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            json_mode=True
+        )
+        data = json.loads(content)
+        analysis = f"Rating: {int(float(data['rating']))}\nReason: {data['reason']}"
+    except Exception as e:
+        return f"Error analyzing text: {str(e)}", None
+
+    prefilter.observe(text, analysis)
+    rewrite = data.get("rewrite")
+    return analysis, rewrite.strip() if isinstance(rewrite, str) and rewrite.strip() else None
+
+
+async def _stream_completion(prompt: str) -> AsyncIterator[str]:
+    """Yield content tokens from the provider's streaming chat API as they arrive"""
+    async for token in provider.stream(messages=[{"role": "user", "content": prompt}]):
+        yield token
+
+
+async def stream_civilized_version(text: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_civilized_version
+    Falls back to the original text if the stream fails before any token
+    """
+    prompt = f"""
+    Rewrite this text to be polite and constructive, removing toxicity:
+    "{text}"
+    
+    Reply with the rewritten text only.
+    """
+    sent = False
+    try:
+        async for token in _stream_completion(prompt):
+            sent = True
+            yield token
+    except Exception:
+        if not sent:
+            yield text.strip()
+
+
+async def stream_reply_options(text: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_reply_options
+    Yields raw tokens of three lines: 'POLITE: ...', 'EDUCATIONAL: ...', 'FIRM: ...'
+    """
+    prompt = f"""
+    Help me reply to this potentially toxic comment: "{text}"
+    
+    Generate 3 constructive responses:
+    1. Polite (kill them with kindness)
+    2. Educational (correcting facts/bias)
+    3. Firm (setting boundaries)
+    
+    Return EXACTLY three lines in this format, nothing else:
+    POLITE: ...
+    EDUCATIONAL: ...
+    FIRM: ...
+    """
+    try:
+        async for token in _stream_completion(prompt):
+            yield token
+    except Exception:
+        return
+
+
+def _chunks(items: list, size: int) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _numbered(texts: list[str]) -> str:
+    return "\n".join(f"{i}. {json.dumps(t, ensure_ascii=False)}" for i, t in enumerate(texts, start=1))
+
+
+async def _complete_json_results(prompt: str) -> dict[int, dict]:
+    """Run a numbered multi-item prompt and index the JSON results by item id"""
+    content = await provider.complete(
+        messages=[
+            {"role": "system", "content": "You are a helpful JSON generator. Output only valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        json_mode=True
+    )
+    data = json.loads(content)
+    results = {}
+    for item in data.get("results", []):
+        try:
+            results[int(item["id"])] = item
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
+
+
+async def _analyze_toxicity_chunk(texts: list[str]) -> list[str]:
+    prompt = f"""
+    You are a hate speech detection engine. Analyze each numbered text below for toxicity, hate speech, and offensive content.
+    
+    {_numbered(texts)}
+    
+    Return ONLY a JSON object: {{ "results": [ {{ "id": 1, "rating": 0-100, "reason": "1 sentence explanation" }}, ... ] }}
+    Include exactly one result per numbered text.
+    
+    0 = Completely safe/positive
+    100 = Extreme hate speech/violence
+    """
+    try:
+        results = await _complete_json_results(prompt)
+    except Exception:
+        results = {}
+
+    analyses: list[Optional[str]] = []
+    for i, text in enumerate(texts, start=1):
+        item = results.get(i, {})
+        try:
+            analysis = f"Rating: {int(float(item['rating']))}\nReason: {item['reason']}"
+        except (KeyError, TypeError, ValueError):
+            analyses.append(None)
+            continue
+        prefilter.observe(text, analysis)
+        analyses.append(analysis)
+
+    # Items the model dropped or mangled fall back to single-text analysis
+    missing = [i for i, a in enumerate(analyses) if a is None]
+    if missing:
+        retried = await asyncio.gather(*(analyze_toxicity_llm(texts[i]) for i in missing))
+        for i, analysis in zip(missing, retried):
+            analyses[i] = analysis
+    return analyses  # type: ignore
+
+
+async def analyze_toxicity_batch(texts: list[str]) -> list[str]:
+    """
+    Analyze many texts with as few LLM calls as possible
+    Returns one 'Rating: ...\nReason: ...' string per text, in input order
+    """
+    analyses = [local_analysis(text) for text in texts]
+    remote = [i for i, analysis in enumerate(analyses) if analysis is None]
+    chunks = await asyncio.gather(*(
+        _analyze_toxicity_chunk([texts[i] for i in c]) for c in _chunks(remote, config.DECISION_BATCH_SIZE)
+    ))
+    for i, analysis in zip(remote, (a for chunk in chunks for a in chunk)):
+        analyses[i] = analysis
+    return analyses  # type: ignore
+
+
+async def _civilize_chunk(texts: list[str]) -> list[str]:
+    prompt = f"""
+    Rewrite each numbered text below to be polite and constructive, removing toxicity:
+    
+    {_numbered(texts)}
+    
+    Return ONLY a JSON object: {{ "results": [ {{ "id": 1, "rewrite": "..." }}, ... ] }}
+    Include exactly one result per numbered text.
+    """
+    try:
+        results = await _complete_json_results(prompt)
+    except Exception:
+        results = {}
+
+    rewrites: list[Optional[str]] = []
+    for i in range(1, len(texts) + 1):
+        rewrite = (results.get(i) or {}).get("rewrite")
+        rewrites.append(rewrite.strip() if isinstance(rewrite, str) and rewrite.strip() else None)
+
+    missing = [i for i, r in enumerate(rewrites) if r is None]
+    if missing:
+        retried = await asyncio.gather(*(generate_civilized_version(texts[i]) for i in missing))
+        for i, rewrite in zip(missing, retried):
+            rewrites[i] = rewrite
+    return rewrites  # type: ignore
+
+
+async def generate_civilized_versions(texts: list[str]) -> list[str]:
+    """
+    Rewrite many toxic texts with as few LLM calls as possible (input order)
+    """
+    chunks = await asyncio.gather(*(_civilize_chunk(c) for c in _chunks(texts, config.DECISION_BATCH_SIZE)))
+    return [rewrite for chunk in chunks for rewrite in chunk]
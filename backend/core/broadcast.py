@@ -0,0 +1,86 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set
+
+
+class Subscriber:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class Broadcaster:
+    """
+    Fan-out of pre-encoded messages to many subscribers.
+    Each message is encoded once by the publisher and the same bytes are
+    queued for every subscriber; queues are bounded, and a subscriber whose
+    queue fills up (a slow consumer) is dropped instead of buffering without
+    limit. Dropped clients are expected to reconnect and resync.
+    Runs on the event loop thread only.
+    """
+
+    def __init__(self, queue_size: int = 32, max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, first: Optional[bytes] = None) -> Optional[Subscriber]:
+        """Register a subscriber (None when full), optionally queueing a first message for it alone"""
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            return None
+        subscriber = Subscriber(self.queue_size)
+        if first is not None:
+            subscriber.queue.put_nowait(first)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, message: bytes) -> None:
+        self.published += 1
+        slow = []
+        for subscriber in self._subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                slow.append(subscriber)
+        for subscriber in slow:
+            self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        self.dropped += 1
+        # Discard the backlog and wake the consumer with the end-of-stream marker
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    async def listen(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """Yield messages until the subscriber is dropped; always unsubscribes on exit"""
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped_slow": self.dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,361 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import hashlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from backend.core import config
+
+
+class Verdict(NamedTuple):
+    """Parsed decision for one piece of text (what the decision engine returns)"""
+    score: float
+    reason: str
+    action: str
+    replacement: Optional[str]
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies of a post share a key"""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+def content_key(text: str, model: str, prompt_version: str) -> str:
+    """Hash of normalized text + model + prompt version"""
+    payload = f"{model}\x00{prompt_version}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    Bounded LRU/TTL cache of verdicts with an optional SQLite tier.
+    Memory is checked first; SQLite hits are promoted back into memory.
+    SQLite never runs on the caller's thread: lookup() reads the disk tier
+    in a worker thread, and writes are queued to one background thread that
+    commits them in batches (one transaction per batch).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600, db_path: Optional[str] = None,
+                 write_batch_size: int = 256):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.write_batch_size = write_batch_size
+        self._entries: "OrderedDict[str, Tuple[float, Verdict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_batches = 0
+        self.disk_writes = 0
+
+        if db_path:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, score REAL, reason TEXT, action TEXT, "
+                "replacement TEXT, expires_at REAL)"
+            )
+            threading.Thread(target=self._write_loop, name="verdict-cache-writer", daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread: lookups read concurrently with the writer under WAL
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path or ":memory:", timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # --- reads ---
+
+    def get(self, key: str) -> Optional[Verdict]:
+        """Memory tier only: never touches SQLite"""
+        with self._lock:
+            verdict = self._memory_get(key, time.time())
+            if verdict is None:
+                self.misses += 1
+            return verdict
+
+    async def lookup(self, key: str) -> Optional[Verdict]:
+        """Memory first, then the SQLite tier in a worker thread"""
+        return (await self.lookup_many([key])).get(key)
+
+    async def lookup_many(self, keys: List[str]) -> Dict[str, Verdict]:
+        """Cached verdicts for keys (missing keys are left out), with one disk read for all memory misses"""
+        now = time.time()
+        found: Dict[str, Verdict] = {}
+        with self._lock:
+            for key in keys:
+                verdict = self._memory_get(key, now)
+                if verdict is not None:
+                    found[key] = verdict
+        missing = [key for key in keys if key not in found]
+        from_disk: Dict[str, Verdict] = {}
+        if missing and self.db_path:
+            from_disk = await asyncio.to_thread(self._disk_get, missing, now)
+        with self._lock:
+            for key, verdict in from_disk.items():
+                self._insert(key, verdict, now)
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        found.update(from_disk)
+        return found
+
+    def _memory_get(self, key: str, now: float) -> Optional[Verdict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, verdict = entry
+        if expires_at > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+        del self._entries[key]
+        self.expirations += 1
+        return None
+
+    def _disk_get(self, keys: List[str], now: float) -> Dict[str, Verdict]:
+        found: Dict[str, Verdict] = {}
+        db = self._connection()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = db.execute(
+                "SELECT key, score, reason, action, replacement, expires_at FROM verdicts "
+                f"WHERE key IN ({','.join('?' * len(chunk))})", chunk,
+            ).fetchall()
+            for key, score, reason, action, replacement, expires_at in rows:
+                if expires_at <= now:
+                    self._writes.put(("DELETE FROM verdicts WHERE key = ? AND expires_at <= ?", (key, now)))
+                    with self._lock:
+                        self.expirations += 1
+                    continue
+                found[key] = Verdict(score=score, reason=reason, action=action, replacement=replacement)
+        return found
+
+    # --- writes ---
+
+    def put(self, key: str, verdict: Verdict) -> None:
+        now = time.time()
+        with self._lock:
+            self._insert(key, verdict, now)
+        if self.db_path:
+            self._writes.put((
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                (key, verdict.score, verdict.reason, verdict.action, verdict.replacement, now + self.ttl_seconds),
+            ))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._writes.put(("DELETE FROM verdicts", ()))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed (False on timeout)"""
+        if not self.db_path:
+            return True
+        done = threading.Event()
+        self._writes.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self) -> None:
+        db = self._connection()
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            # flush() markers are released once everything queued before them is committed
+            markers = [item for item in batch if isinstance(item, threading.Event)]
+            statements = [item for item in batch if not isinstance(item, threading.Event)]
+            try:
+                if statements:
+                    db.execute("BEGIN")
+                    for sql, params in statements:
+                        db.execute(sql, params)
+                    db.execute("COMMIT")
+                    self.disk_batches += 1
+                    self.disk_writes += len(statements)
+            except sqlite3.Error as e:
+                # The disk tier is best-effort: memory still has the verdicts
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                print(f"Verdict cache write failed: {e}")
+            for marker in markers:
+                marker.set()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk_tier": bool(self.db_path),
+            "disk_batches": self.disk_batches,
+            "disk_writes": self.disk_writes,
+            "disk_queued": self._writes.qsize(),
+        }
+
+    def _insert(self, key: str, verdict: Verdict, now: float) -> None:
+        self._entries[key] = (now + self.ttl_seconds, verdict)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes for sublinear Hamming-radius lookups"""
+
+    def __init__(self):
+        # node = [hash, {distance: child node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int) -> None:
+        if self._root is None:
+            self._root = [value, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """Return (distance, hash) for every stored hash within max_distance, nearest first"""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[0]))
+            # Triangle inequality: only subtrees at |d - distance| <= max_distance can match
+            for child_distance, child in node[1].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class ImageVerdictCache:
+    """
+    Image verdicts keyed by perceptual hash. Near-duplicates (re-encodes,
+    resizes) within max_distance bits reuse the stored verdict. Entries are
+    also keyed by a context (prompt description) so different questions
+    about the same image don't share answers.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: float = 86400, max_distance: int = 6):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, image_hash: int, context: Hashable = "") -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            for distance, candidate in self._tree.search(image_hash, self.max_distance):
+                key = (candidate, context)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if distance:
+                    self.near_hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, image_hash: int, value: Any, context: Hashable = "") -> None:
+        with self._lock:
+            self._tree.add(image_hash)
+            self._entries[(image_hash, context)] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end((image_hash, context))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            # BK-trees can't delete: rebuild once evicted hashes dominate
+            if self._tree.size > 2 * len(self._entries) + 64:
+                self._tree = BKTree()
+                for h, _ in self._entries:
+                    self._tree.add(h)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "tree_size": self._tree.size,
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache for the decision engine
+verdict_cache = VerdictCache(
+    max_entries=config.VERDICT_CACHE_SIZE,
+    ttl_seconds=config.VERDICT_CACHE_TTL,
+    db_path=config.VERDICT_CACHE_DB,
+)
+
+# Shared perceptual-hash cache for /decision/analyze-image
+image_cache = ImageVerdictCache(
+    max_entries=config.IMAGE_CACHE_SIZE,
+    ttl_seconds=config.IMAGE_CACHE_TTL,
+    max_distance=config.IMAGE_HASH_MAX_DISTANCE,
+)
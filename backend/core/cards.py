@@ -0,0 +1,266 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import hashlib
+import math
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from backend.core import config
+from backend.core.cache import normalize_text
+from backend.core.lexicon import HATE_SPEECH_EXAMPLES
+
+# Card kinds and the answer each one expects in the game
+CARD_TYPES = {"real": "CLICK", "satire": "CAP", "hate": "CAP"}
+
+_RATING = re.compile(r"Rating[:\s]+(\d+)", re.IGNORECASE)
+
+
+def card_id(kind: str, text: str) -> str:
+    """Stable content-hash ID: the same headline always gets the same card"""
+    payload = f"{kind}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over card IDs. Card IDs are already uniform
+    content hashes, so their bits are used directly for double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, cid: str) -> Iterable[int]:
+        key = int(cid[:16], 16)
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, cid: str) -> None:
+        for pos in self._positions(cid):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, cid: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(cid))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+
+class SeenSets:
+    """
+    Per-player Bloom filters of dealt cards, bounded LRU over players.
+    A filter that reaches capacity starts over, so long-time players cycle
+    through the corpus again instead of saturating to all-seen.
+    Memory is about max_players x capacity x 1.2 bytes (1% error rate):
+    ~24 MB for the defaults.
+    """
+
+    def __init__(self, max_players: int, capacity: int, error_rate: float):
+        self.max_players = max_players
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._players: "OrderedDict[str, BloomFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.resets = 0
+
+    def get(self, player_id: str) -> BloomFilter:
+        with self._lock:
+            seen = self._players.get(player_id)
+            if seen is None or seen.full:
+                if seen is not None:
+                    self.resets += 1
+                seen = BloomFilter(self.capacity, self.error_rate)
+                self._players[player_id] = seen
+            self._players.move_to_end(player_id)
+            while len(self._players) > self.max_players:
+                self._players.popitem(last=False)
+                self.evictions += 1
+            return seen
+
+    def stats(self) -> Dict[str, object]:
+        probe = BloomFilter(self.capacity, self.error_rate)
+        return {
+            "players": len(self._players),
+            "max_players": self.max_players,
+            "bytes_per_player": len(probe._bits),
+            "evictions": self.evictions,
+            "resets": self.resets,
+        }
+
+
+class CardStore:
+    """
+    Every headline ever fetched, persisted in SQLite with a stable ID and a
+    precomputed toxicity score. Decks are drawn from in-memory, pre-shuffled
+    buckets per kind, so building one is O(deck size) with no I/O.
+    """
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, text TEXT NOT NULL, source TEXT, "
+            "explanation TEXT, toxicity REAL, added_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cards_kind ON cards (kind)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cards_unscored ON cards (id) WHERE toxicity IS NULL")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+        self._cards: Dict[str, dict] = {}
+        self._buckets: Dict[str, List[str]] = {kind: [] for kind in CARD_TYPES}
+        self._cursors: Dict[str, int] = {kind: 0 for kind in CARD_TYPES}
+        self._dirty = set(CARD_TYPES)
+        self.classified = 0
+
+        for row in self._db.execute("SELECT id, kind, text, source, explanation, toxicity FROM cards"):
+            self._cards[row[0]] = self._card(*row)
+
+        self.add(
+            [{"text": e["title"], "source": "Anonymous / Social Media",
+              "explanation": f"Hate Speech Detected: {e['explanation']}"} for e in HATE_SPEECH_EXAMPLES],
+            "hate",
+        )
+
+    @staticmethod
+    def _card(id: str, kind: str, text: str, source: str, explanation: str, toxicity: Optional[float]) -> dict:
+        return {
+            "id": id,
+            "text": text,
+            "type": CARD_TYPES[kind],
+            "kind": kind,
+            "source": source,
+            "explanation": explanation,
+            "toxicity": toxicity,
+        }
+
+    def add(self, items: Iterable[dict], kind: str) -> int:
+        """Insert unseen headlines of one kind; returns how many were new"""
+        now = time.time()
+        new = []
+        with self._lock:
+            for item in items:
+                cid = card_id(kind, item["text"])
+                if cid in self._cards:
+                    continue
+                card = self._card(cid, kind, item["text"], item["source"], item["explanation"], None)
+                self._cards[cid] = card
+                new.append((cid, kind, card["text"], card["source"], card["explanation"], None, now))
+            if new:
+                self._db.executemany("INSERT OR IGNORE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)", new)
+                self._db.commit()
+                self._dirty.add(kind)
+        return len(new)
+
+    def unscored(self, limit: int) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM cards WHERE toxicity IS NULL LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._cards[row[0]] for row in rows if row[0] in self._cards]
+
+    def set_toxicity(self, scores: Dict[str, float]) -> None:
+        with self._lock:
+            self._db.executemany("UPDATE cards SET toxicity = ? WHERE id = ?",
+                                 [(score, cid) for cid, score in scores.items()])
+            self._db.commit()
+            for cid, score in scores.items():
+                if cid in self._cards:
+                    self._cards[cid]["toxicity"] = score
+        self.classified += len(scores)
+
+    async def classify_pending(self, limit: int = 200) -> int:
+        """Score unscored cards with the decision engine (batched LLM calls)"""
+        from backend.core.ai import FALLBACK_MARKER, analyze_toxicity_batch
+
+        cards = await asyncio.to_thread(self.unscored, limit)
+        if not cards:
+            return 0
+        analyses = await analyze_toxicity_batch([card["text"] for card in cards])
+        scores = {}
+        for card, analysis in zip(cards, analyses):
+            match = _RATING.search(analysis)
+            # Leave failures unscored so the next refresh retries them
+            if match and not analysis.startswith("Error") and FALLBACK_MARKER not in analysis:
+                scores[card["id"]] = min(100.0, float(match.group(1)))
+        await asyncio.to_thread(self.set_toxicity, scores)
+        return len(scores)
+
+    def draw(self, kind: str, count: int, seen: Optional[BloomFilter] = None) -> List[dict]:
+        """
+        Next cards from the kind's shuffled bucket, reshuffling when it runs out.
+        With a player's seen-set, skip (and record) cards already dealt to them.
+        """
+        with self._lock:
+            if kind in self._dirty:
+                self._buckets[kind] = [cid for cid, card in self._cards.items() if card["kind"] == kind]
+                random.shuffle(self._buckets[kind])
+                self._cursors[kind] = 0
+                self._dirty.discard(kind)
+            bucket = self._buckets[kind]
+            count = min(count, len(bucket))
+            if seen is not None:
+                return self._draw_unseen(bucket, count, seen)
+            drawn = []
+            for _ in range(count):
+                if self._cursors[kind] >= len(bucket):
+                    random.shuffle(bucket)
+                    self._cursors[kind] = 0
+                drawn.append(self._cards[bucket[self._cursors[kind]]])
+                self._cursors[kind] += 1
+        return drawn
+
+    def _draw_unseen(self, bucket: List[str], count: int, seen: BloomFilter) -> List[dict]:
+        # The bucket is shuffled, so walking from a random offset is a random sample.
+        # Probes are capped, keeping each draw O(1) even for players who've seen most cards.
+        drawn = []
+        start = random.randrange(len(bucket)) if bucket else 0
+        for step in range(min(len(bucket), count * 8 + 32)):
+            cid = bucket[(start + step) % len(bucket)]
+            if cid in seen:
+                continue
+            seen.add(cid)
+            drawn.append(self._cards[cid])
+            if len(drawn) == count:
+                break
+        if len(drawn) < count:
+            # The player has been dealt (nearly) the whole bucket: top up with repeats
+            # rather than dealing a short or empty hand until new headlines arrive
+            dealt = {card["id"] for card in drawn}
+            for step in range(len(bucket)):
+                cid = bucket[(start + step) % len(bucket)]
+                if cid not in dealt:
+                    drawn.append(self._cards[cid])
+                    if len(drawn) == count:
+                        break
+        return drawn
+
+    def stats(self) -> Dict[str, object]:
+        counts = {kind: 0 for kind in CARD_TYPES}
+        unscored = 0
+        for card in self._cards.values():
+            counts[card["kind"]] += 1
+            unscored += card["toxicity"] is None
+        return {"cards": len(self._cards), "by_kind": counts, "unscored": unscored,
+                "classified": self.classified}
+
+
+card_store = CardStore(config.CARD_DB_PATH)
+
+player_seen = SeenSets(
+    max_players=config.PLAYER_SEEN_MAX_PLAYERS,
+    capacity=config.PLAYER_SEEN_CAPACITY,
+    error_rate=config.PLAYER_SEEN_ERROR_RATE,
+)
@@ -13,3 +13,121 @@ MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Verdict cache (decision engine)
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL = float(os.getenv("VERDICT_CACHE_TTL", "3600"))
+VERDICT_CACHE_DB = os.getenv("VERDICT_CACHE_DB")  # optional SQLite path for the on-disk tier
+
+# Batch decision engine
+DECISION_BATCH_SIZE = int(os.getenv("DECISION_BATCH_SIZE", "20"))  # texts per LLM prompt
+DECISION_BATCH_MAX_TEXTS = int(os.getenv("DECISION_BATCH_MAX_TEXTS", "200"))  # texts per request
+
+# Decision thresholds (score 0-100)
+WARN_THRESHOLD = 30
+HIDE_THRESHOLD = 70
+
+# Local pre-filter ahead of the LLM
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+PREFILTER_MARGIN = float(os.getenv("PREFILTER_MARGIN", "15"))  # distance from a threshold needed to answer locally
+PREFILTER_MIN_COVERAGE = float(os.getenv("PREFILTER_MIN_COVERAGE", "1.0"))  # share of known tokens needed for a local ALLOW
+PREFILTER_ONLINE_LEARNING = os.getenv("PREFILTER_ONLINE_LEARNING", "true").lower() == "true"
+
+# How decisions get their civilized rewrite:
+#   sequential  - score first, then rewrite if needed (two LLM latencies) - default
+#   speculative - start the rewrite alongside scoring, cancel it on ALLOW; opt-in, since most
+#                 texts are ALLOW and each of them still pays for (part of) a rewrite call
+#   combined    - one JSON prompt returns score, reason and rewrite
+DECISION_REWRITE_MODE = os.getenv("DECISION_REWRITE_MODE", "sequential").lower()
+
+# LLM provider: mistral, openai, groq, gemini or fake (comma-separated list = failover order)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "mistral")
+
+# Deterministic local stand-in provider ("fake") for load tests and CI
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_ERROR_STATUS = int(os.getenv("FAKE_LLM_ERROR_STATUS", "503"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Upstream governor (per LLM provider)
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))
+UPSTREAM_RATE_PER_SEC = float(os.getenv("UPSTREAM_RATE_PER_SEC", "5"))  # size to the provider quota, 0 = unlimited
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))  # seconds
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "20"))  # per attempt
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failures to open
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))  # open -> half-open probe
+
+# Image verdict cache (perceptual hash)
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "5000"))
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", "86400"))
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "6"))  # of 64 dHash bits
+
+# Image preprocessing before upload to the vision model
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))  # reject larger inputs (413)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))  # reject larger dimensions (413)
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))  # Pixtral's effective input resolution
+IMAGE_UPLOAD_FORMAT = os.getenv("IMAGE_UPLOAD_FORMAT", "jpeg").lower()  # jpeg or webp
+IMAGE_UPLOAD_QUALITY = int(os.getenv("IMAGE_UPLOAD_QUALITY", "85"))
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(512 * 1024)))  # re-encode budget
+
+# Game deck headline pool (refreshed in the background)
+NEWS_REFRESH_SECONDS = float(os.getenv("NEWS_REFRESH_SECONDS", "300"))
+NEWS_POOL_PER_FEED = int(os.getenv("NEWS_POOL_PER_FEED", "20"))  # headlines kept per feed
+NEWS_FETCH_TIMEOUT = float(os.getenv("NEWS_FETCH_TIMEOUT", "5"))
+
+# Persistent headline corpus behind /game/deck
+CARD_DB_PATH = os.getenv("CARD_DB_PATH", "cards.db")
+CARD_CLASSIFY_BATCH = int(os.getenv("CARD_CLASSIFY_BATCH", "200"))  # cards scored per refresh
+
+# Per-player seen-sets for /game/deck?player_id=... (Bloom filters, LRU over players)
+# ~2.4 KB per player at the default capacity / error rate: 10,000 players ~ 24 MB
+PLAYER_SEEN_MAX_PLAYERS = int(os.getenv("PLAYER_SEEN_MAX_PLAYERS", "10000"))
+PLAYER_SEEN_CAPACITY = int(os.getenv("PLAYER_SEEN_CAPACITY", "2000"))  # cards per player before the set starts over
+PLAYER_SEEN_ERROR_RATE = float(os.getenv("PLAYER_SEEN_ERROR_RATE", "0.01"))
+
+# Users, actions and global stats (SQLite in WAL mode, shared by all workers)
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", "users.db")
+USERS_WRITE_BATCH_SIZE = int(os.getenv("USERS_WRITE_BATCH_SIZE", "256"))  # ops per transaction
+USERS_WRITE_BATCH_WAIT_MS = float(os.getenv("USERS_WRITE_BATCH_WAIT_MS", "5"))  # let bursts coalesce
+
+# In-memory leaderboard index: how often to pick up other workers' writes
+LEADERBOARD_SYNC_SECONDS = float(os.getenv("LEADERBOARD_SYNC_SECONDS", "1"))
+
+# Columnar action log (analytics): segments are flushed to memory-mapped files
+ACTION_LOG_DIR = os.getenv("ACTION_LOG_DIR", "action_log")
+ACTION_LOG_SEGMENT_EVENTS = int(os.getenv("ACTION_LOG_SEGMENT_EVENTS", "65536"))
+ACTION_LOG_FLUSH_SECONDS = float(os.getenv("ACTION_LOG_FLUSH_SECONDS", "60"))
+ACTION_LOG_RETENTION_SECONDS = float(os.getenv("ACTION_LOG_RETENTION_SECONDS", str(30 * 86400)))  # then deleted
+ACTION_LOG_MAX_SEGMENTS = int(os.getenv("ACTION_LOG_MAX_SEGMENTS", "64"))  # mapped segments per worker before merging
+
+# POST /users/actions batch ingestion
+USERS_ACTION_BATCH_MAX = int(os.getenv("USERS_ACTION_BATCH_MAX", "500"))
+IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "86400"))  # how long retries are deduped
+
+# Hate Weather aggregation (fed by decision-engine verdicts)
+WEATHER_FAST_SECONDS = float(os.getenv("WEATHER_FAST_SECONDS", "300"))  # decay time of the current level
+WEATHER_SLOW_SECONDS = float(os.getenv("WEATHER_SLOW_SECONDS", "3600"))  # decay time of the trend baseline
+WEATHER_TREND_DELTA = float(os.getenv("WEATHER_TREND_DELTA", "3"))  # level points above/below baseline for up/down
+WEATHER_TICK_SECONDS = float(os.getenv("WEATHER_TICK_SECONDS", "2"))  # snapshot rebuild interval
+WEATHER_CACHE_SECONDS = int(os.getenv("WEATHER_CACHE_SECONDS", "5"))  # Cache-Control max-age of snapshots
+WEATHER_STREAM_QUEUE = int(os.getenv("WEATHER_STREAM_QUEUE", "32"))  # pending updates before a viewer is dropped
+WEATHER_STREAM_MAX_SUBSCRIBERS = int(os.getenv("WEATHER_STREAM_MAX_SUBSCRIBERS", "10000"))
+WEATHER_STREAM_KEEPALIVE_SECONDS = float(os.getenv("WEATHER_STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Hate Weather history: minute/hour/day ring buffers in a memory-mapped file per worker
+# (WEATHER_HISTORY_PATH, then WEATHER_HISTORY_PATH.1, .2, ... for further workers)
+WEATHER_HISTORY_PATH = os.getenv("WEATHER_HISTORY_PATH", "weather_history.bin")
+WEATHER_HISTORY_MAX_SERIES = int(os.getenv("WEATHER_HISTORY_MAX_SERIES", "128"))  # (platform, region) series kept
+# A full file recycles the least recently written series once it has been idle this long
+WEATHER_HISTORY_IDLE_SECONDS = float(os.getenv("WEATHER_HISTORY_IDLE_SECONDS", str(7 * 86400)))
+WEATHER_TRENDS_MAX_POINTS = int(os.getenv("WEATHER_TRENDS_MAX_POINTS", "2000"))  # per /trends response
+
+# Trending toxic terms (fixed-memory sketch over WARN/HIDE texts)
+TRENDING_HALF_LIFE_SECONDS = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", "3600"))
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "256"))  # terms tracked in the top-k table
+TRENDING_SKETCH_WIDTH = int(os.getenv("TRENDING_SKETCH_WIDTH", "4096"))
+TRENDING_SKETCH_DEPTH = int(os.getenv("TRENDING_SKETCH_DEPTH", "4"))
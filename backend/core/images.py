@@ -0,0 +1,170 @@
+# pyre-ignore-all-errors[21]
+import base64
+import io
+from typing import IO, NamedTuple, Optional, Union, cast
+
+from backend.core import config
+
+try:
+    from PIL import Image
+    # Refuse decompression bombs up front instead of only warning about them
+    Image.MAX_IMAGE_PIXELS = config.IMAGE_MAX_PIXELS
+    LANCZOS = Image.Resampling.LANCZOS
+except ImportError:  # Pillow is optional: without it images are forwarded as-is and not hashed
+    Image = None
+    LANCZOS = None
+
+
+class ImageTooLargeError(ValueError):
+    """Image dimensions exceed IMAGE_MAX_PIXELS"""
+
+
+def decode_image_data(image_data: str) -> bytes:
+    """Decode base64 image data, with or without a 'data:image/...;base64,' prefix"""
+    if image_data.startswith("data:") and "," in image_data:
+        image_data = image_data.split(",", 1)[1]
+    return base64.b64decode(image_data)
+
+
+def image_data_mime(image_data: str, default: str = "image/jpeg") -> str:
+    """MIME type from a 'data:image/png;base64,...' prefix"""
+    if image_data.startswith("data:") and ";" in image_data:
+        return image_data[5:image_data.index(";")] or default
+    return default
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only file over a buffer, without copying it (unlike io.BytesIO)"""
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), len(self._view) - self._pos)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def open_image(raw: Union[bytes, bytearray, memoryview]):
+    """
+    Open image bytes with Pillow, reading only the header (None if Pillow is
+    missing or the bytes aren't an image). Pixels are decoded on load().
+    Raises ImageTooLargeError past IMAGE_MAX_PIXELS.
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(cast(IO[bytes], MemoryViewReader(raw)))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except Exception:
+        return None
+    width, height = img.size
+    if width * height > config.IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError(f"Image has {width * height} pixels, more than {config.IMAGE_MAX_PIXELS}")
+    return img
+
+
+def dhash(img, hash_size: int = 8) -> int:
+    """
+    Difference hash: compare neighbouring pixels of a tiny grayscale thumbnail.
+    Robust to re-encoding, rescaling and small edits; 64 bits for hash_size=8.
+    Expects an already downscaled image (see prepare_image).
+    """
+    small = img.convert("L").resize((hash_size + 1, hash_size), LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class PreparedImage(NamedTuple):
+    """Image ready for upload to the vision model (raw bytes, base64 happens at the provider)"""
+    content: bytes
+    mime: str
+    image_hash: int
+    original_bytes: int
+    upload_bytes: int
+
+
+def _flatten(img):
+    # JPEG has no alpha/palette: composite transparency onto white
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = rgba.convert("RGB")
+        background.paste((255, 255, 255), (0, 0, *rgba.size))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def _encode(img, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    # A fresh save without exif/icc_profile/info strips all metadata
+    img.save(out, format=fmt, quality=quality, optimize=fmt == "JPEG")
+    return out.getvalue()
+
+
+def prepare_image(raw: Union[bytes, bytearray, memoryview]) -> Optional[PreparedImage]:
+    """
+    Decode once, downscale to the model's effective input resolution, hash,
+    strip metadata and re-encode compactly (CPU-bound: run in a worker thread).
+    Returns None if Pillow is missing or the bytes aren't an image;
+    raises ImageTooLargeError past IMAGE_MAX_PIXELS.
+    """
+    img = open_image(raw)
+    if img is None:
+        return None
+    side = (config.IMAGE_MAX_SIDE, config.IMAGE_MAX_SIDE)
+    # JPEG: let the decoder skip detail we would throw away (DCT scaling)
+    img.draft("RGB", side)
+    try:
+        img.load()
+    except Exception:
+        return None
+    # Downscale before any full-size mode conversion (palette images are flattened first)
+    if img.mode not in ("1", "P"):
+        img.thumbnail(side)
+    img = _flatten(img)
+    img.thumbnail(side)
+    image_hash = dhash(img)
+
+    fmt = "WEBP" if config.IMAGE_UPLOAD_FORMAT == "webp" else "JPEG"
+    quality = config.IMAGE_UPLOAD_QUALITY
+    encoded = _encode(img, fmt, quality)
+    # Step quality down until the upload fits the budget
+    while len(encoded) > config.IMAGE_UPLOAD_MAX_BYTES and quality > 40:
+        quality -= 15
+        encoded = _encode(img, fmt, quality)
+
+    return PreparedImage(content=encoded, mime=f"image/{fmt.lower()}", image_hash=image_hash,
+                         original_bytes=len(raw), upload_bytes=len(encoded))
+
+
+# Upload size counters, exposed through /health/metrics
+upload_stats = {"prepared": 0, "original_bytes": 0, "upload_bytes": 0}
+
+
+def record_upload(prepared: PreparedImage) -> None:
+    upload_stats["prepared"] += 1
+    upload_stats["original_bytes"] += prepared.original_bytes
+    upload_stats["upload_bytes"] += prepared.upload_bytes
@@ -0,0 +1,305 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import heapq
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from backend.core import config
+from backend.core.storage import UserRecord, UserStore, user_store
+
+MAX_LEVEL = 32
+
+
+class IndexableSkipList:
+    """
+    Sorted list with O(log n) insert/remove/rank and O(log n + k) slicing.
+    Each link stores its width (how many bottom-level nodes it skips),
+    which is what makes positional lookups logarithmic.
+    """
+
+    def __init__(self):
+        # node = [key, next pointers per level, widths per level]
+        self._head: List[Any] = [None, [None] * MAX_LEVEL, [1] * MAX_LEVEL]
+        self._level = 1
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def _random_level() -> int:
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key) -> Tuple[List[Any], List[int]]:
+        # For each level: last node before key, and that node's position
+        update = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in range(self._level - 1, -1, -1):
+            while node[1][level] is not None and node[1][level][0] < key:
+                position += node[2][level]
+                node = node[1][level]
+            update[level] = node
+            positions[level] = position
+        return update, positions
+
+    def insert(self, key) -> None:
+        update, positions = self._path(key)
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                update[i] = self._head
+                positions[i] = 0
+                self._head[2][i] = self.size + 1
+            self._level = level
+        node: List[Any] = [key, [None] * level, [0] * level]
+        index = positions[0] + 1  # position of the new node
+        for i in range(level):
+            prev = update[i]
+            node[1][i] = prev[1][i]
+            prev[1][i] = node
+            # Split prev's link around the new node
+            node[2][i] = prev[2][i] - (index - positions[i]) + 1
+            prev[2][i] = index - positions[i]
+        for i in range(level, self._level):
+            update[i][2][i] += 1
+        self.size += 1
+
+    def remove(self, key) -> bool:
+        update, _ = self._path(key)
+        node = update[0][1][0]
+        if node is None or node[0] != key:
+            return False
+        for i in range(self._level):
+            if update[i][1][i] is node:
+                update[i][2][i] += node[2][i] - 1
+                update[i][1][i] = node[1][i]
+            else:
+                update[i][2][i] -= 1
+        self.size -= 1
+        return True
+
+    def rank(self, key) -> Optional[int]:
+        """0-based position of key, or None if absent"""
+        update, positions = self._path(key)
+        node = update[0][1][0]
+        if node is None or node[0] != key:
+            return None
+        return positions[0]
+
+    def slice(self, start: int, count: int) -> List[Any]:
+        """Keys at positions [start, start + count)"""
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+        # Descend by widths to the node just before position start
+        node, position = self._head, 0
+        for level in range(self._level - 1, -1, -1):
+            while node[1][level] is not None and position + node[2][level] <= start:
+                position += node[2][level]
+                node = node[1][level]
+        keys = []
+        node = node[1][0]
+        while node is not None and len(keys) < count:
+            keys.append(node[0])
+            node = node[1][0]
+        return keys
+
+
+class RollingWindow:
+    """
+    Rolling-window score totals from a ring of time buckets (e.g. 24 hourly
+    buckets for "daily"). Totals are kept pre-aggregated: adding an action
+    bumps one bucket and the running total, and expired buckets are
+    subtracted out and dropped, so memory stays bounded by the window.
+    """
+
+    def __init__(self, bucket_seconds: int, num_buckets: int):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self._buckets: "OrderedDict[int, Dict[str, int]]" = OrderedDict()
+        self.totals: Dict[str, int] = {}
+
+    def _expire(self, now: float) -> None:
+        oldest = int(now // self.bucket_seconds) - self.num_buckets + 1
+        while self._buckets:
+            index = next(iter(self._buckets))
+            if index >= oldest:
+                break
+            for user_id, points in self._buckets.pop(index).items():
+                remaining = self.totals[user_id] - points
+                if remaining:
+                    self.totals[user_id] = remaining
+                else:
+                    del self.totals[user_id]
+
+    def add(self, user_id: str, points: int, timestamp: float, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        # Evict on writes too, so memory stays bounded even if the board is never read
+        self._expire(now)
+        index = int(timestamp // self.bucket_seconds)
+        if index <= int(now // self.bucket_seconds) - self.num_buckets:
+            return
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            newest = next(reversed(self._buckets), None)
+            bucket = self._buckets[index] = {}
+            # Late arrival for an older bucket: keep buckets in time order
+            if newest is not None and index < newest:
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+        bucket[user_id] = bucket.get(user_id, 0) + points
+        self.totals[user_id] = self.totals.get(user_id, 0) + points
+
+    def top(self, limit: int, now: Optional[float] = None) -> List[Tuple[str, int]]:
+        self._expire(time.time() if now is None else now)
+        return heapq.nlargest(limit, self.totals.items(), key=lambda item: (item[1], item[0]))
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+
+# Windowed boards: name -> (bucket size in seconds, buckets kept)
+WINDOWS = {
+    "daily": (3600, 24),
+    "weekly": (86400, 7),
+}
+
+
+class Leaderboard:
+    """
+    Incremental all-time leaderboard over the user store, ordered by
+    (score desc, user_id). Local writes update it immediately; writes made by
+    other workers are picked up from the actions table every sync_seconds
+    by sync(), which request handlers await before reading.
+    """
+
+    def __init__(self, store: UserStore, sync_seconds: float = 1.0):
+        self.store = store
+        self.sync_seconds = sync_seconds
+        self._index = IndexableSkipList()
+        self._users: Dict[str, UserRecord] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._last_action_id: Optional[int] = None
+        self._synced_at = 0.0
+        self.windows = {name: RollingWindow(*spec) for name, spec in WINDOWS.items()}
+        # Actions this process applied before the next sync reads them back
+        self._local_ids: Set[int] = set()
+
+    @staticmethod
+    def _key(user: UserRecord) -> Tuple[int, str]:
+        return (-user.score, user.user_id)
+
+    def update(self, user: UserRecord) -> None:
+        with self._lock:
+            old = self._users.get(user.user_id)
+            if old is not None:
+                # Results can arrive out of order: never step back to an older state
+                if user.actions_count < old.actions_count:
+                    return
+                if old.score == user.score:
+                    self._users[user.user_id] = user
+                    return
+                self._index.remove(self._key(old))
+            self._users[user.user_id] = user
+            self._index.insert(self._key(user))
+
+    def record(self, action_id: int, user: UserRecord, points: int, timestamp: float) -> None:
+        """Apply a committed action: all-time index plus the rolling windows"""
+        self.update(user)
+        with self._lock:
+            if self._last_action_id is not None and action_id <= self._last_action_id:
+                return  # already applied by a sync
+            self._local_ids.add(action_id)
+            self._add_to_windows(user.user_id, points, timestamp)
+
+    def _add_to_windows(self, user_id: str, points: int, timestamp: float) -> None:
+        for window in self.windows.values():
+            window.add(user_id, points, timestamp)
+
+    def _due(self) -> bool:
+        return self._last_action_id is None or time.monotonic() - self._synced_at >= self.sync_seconds
+
+    async def sync(self) -> None:
+        """Pick up other workers' writes, reading SQLite in a worker thread"""
+        if self._due():
+            await asyncio.to_thread(self._sync)
+
+    def _sync(self) -> None:
+        with self._sync_lock:
+            if self._due():
+                self._synced_at = time.monotonic()
+                self._read_changes()
+
+    def _read_changes(self) -> None:
+        if self._last_action_id is None:
+            last = self.store.last_action_id()
+            for user in self.store.all_users():
+                self.update(user)
+            longest = max(bucket_seconds * num_buckets for bucket_seconds, num_buckets in WINDOWS.values())
+            recent = self.store.actions_since(0, since=datetime.fromtimestamp(time.time() - longest))
+            with self._lock:
+                for action_id, user_id, points, timestamp in recent:
+                    if action_id <= last and action_id not in self._local_ids:
+                        self._add_to_windows(user_id, points, timestamp)
+                self._last_action_id = last
+                self._local_ids = {i for i in self._local_ids if i > last}
+            return
+        latest, changed = self.store.users_changed_since(self._last_action_id)
+        for user in changed:
+            self.update(user)
+        actions = self.store.actions_since(self._last_action_id)
+        with self._lock:
+            for action_id, user_id, points, timestamp in actions:
+                if action_id <= latest and action_id not in self._local_ids:
+                    self._add_to_windows(user_id, points, timestamp)
+            self._last_action_id = latest
+            self._local_ids = {i for i in self._local_ids if i > latest}
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, UserRecord]]:
+        """(rank, user) pairs, O(log n + k)"""
+        with self._lock:
+            keys = self._index.slice(offset, limit)
+            return [(offset + i + 1, self._users[user_id]) for i, (_, user_id) in enumerate(keys)]
+
+    def top_window(self, window: str, limit: int) -> Tuple[List[Tuple[int, UserRecord]], int]:
+        """(rank, user with window score) pairs and the number of users active in the window"""
+        with self._lock:
+            board = self.windows[window]
+            ranked = []
+            for i, (user_id, points) in enumerate(board.top(limit)):
+                user = self._users.get(user_id) or UserRecord(user_id, f"User_{user_id[:8]}", 0, 0)
+                ranked.append((i + 1, user._replace(score=points)))
+            return ranked, len(board)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank, O(log n)"""
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+            position = self._index.rank(self._key(user))
+            return None if position is None else position + 1
+
+    def around(self, user_id: str, radius: int) -> Optional[Tuple[int, List[Tuple[int, UserRecord]]]]:
+        """(1-based rank, ranked neighbours within radius), O(log n + radius)"""
+        with self._lock:
+            user = self._users.get(user_id)
+            position = None if user is None else self._index.rank(self._key(user))
+            if position is None:
+                return None
+            start = max(0, position - radius)
+            keys = self._index.slice(start, position - start + radius + 1)
+            return position + 1, [(start + i + 1, self._users[uid]) for i, (_, uid) in enumerate(keys)]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+leaderboard = Leaderboard(user_store, sync_seconds=config.LEADERBOARD_SYNC_SECONDS)
@@ -0,0 +1,116 @@
+# Word lists shared by the game deck and the local pre-filter
+
+# Small sample of hate speech / toxic examples (Controlled dataset for safety)
+# In production, this would come from a larger database or API.
+HATE_SPEECH_EXAMPLES = [
+    {"title": "They are all the same, get them out of our country!", "explanation": "Generalization and exclusion based on group identity."},
+    {"title": "Women shouldn't be in the workplace, they belong in the kitchen.", "explanation": "Gender-based discrimination and stereotyping."},
+    {"title": "People like that are a disease to society.", "explanation": "Dehumanization, comparing a group to a disease."},
+    {"title": "The world would be better off without [Group X].", "explanation": "Call for elimination or violence against a group."},
+    {"title": "Stop lying, you [slur] are always trying to cheat us.", "explanation": "Use of slurs and negative stereotyping."}
+]
+
+# Default word list of the browser extension (extention1/src/script/lib/Config.ts),
+# grouped by how much they say about toxicity on their own.
+# value = (severity 0-100, whole_word)
+EXTENSION_WORDS = {
+    # Slurs
+    # (whole words only, so "sniggered" does not match)
+    "fag": (95, True),
+    "fags": (95, True),
+    "faggot": (95, True),
+    "faggots": (95, True),
+    "nigga": (95, True),
+    "niggas": (95, True),
+    "nigger": (95, True),
+    "niggers": (95, True),
+    # Insults - toxic in most contexts, but severity depends on the target
+    "asshole": (50, False),
+    "bastard": (50, False),
+    "bitch": (50, False),
+    "cocksucker": (50, False),
+    "cunt": (50, True),
+    "dumbass": (50, False),
+    "jackass": (50, False),
+    "pussies": (50, True),
+    "pussy": (50, True),
+    "slut": (50, False),
+    "twat": (50, True),
+    "twats": (50, True),
+    "whore": (50, False),
+    # Profanity - often harmless ("damn, nice shot")
+    "ass": (20, True),
+    "asses": (20, True),
+    "badass": (20, True),
+    "dammit": (20, True),
+    "damn": (20, True),
+    "fuck": (35, False),
+    "goddammit": (20, True),
+    "hell": (20, True),
+    "piss": (20, True),
+    "pissed": (20, True),
+    "shit": (20, False),
+    "tits": (20, True),
+    "wtf": (20, True),
+    "zebi": (35, True),
+}
+
+# Unambiguous threats, calls for exclusion and dehumanizing phrases
+# (the patterns behind HATE_SPEECH_EXAMPLES plus common threats): confident enough to HIDE locally
+THREAT_PHRASES = {
+    "get them out of our country": 90,
+    "go back to your country": 90,
+    "kill yourself": 95,
+    "kys": 95,
+    "i will kill you": 95,
+    "i am going to kill you": 95,
+    "are subhuman": 90,
+}
+
+# Phrases that are threats or dehumanizing only in context ("hang them on the wall",
+# "cats are animals too", "better off without the extra cheese"): they never decide
+# a verdict locally, the LLM does
+AMBIGUOUS_PHRASES = {
+    "belong in the kitchen": 60,
+    "are a disease": 60,
+    "better off without": 60,
+    "deserve to die": 60,
+    "should all die": 60,
+    "should be killed": 60,
+    "gas them": 60,
+    "hang them": 60,
+    "shoot them all": 60,
+    "are vermin": 60,
+    "are cockroaches": 60,
+    "are animals": 60,
+}
+
+# Everyday benign comments used to seed the local model's notion of "safe"
+SAFE_EXAMPLES = [
+    "Nice photo!",
+    "Great shot, love the colors",
+    "Thanks for sharing this",
+    "Congrats on the new job!",
+    "Happy birthday, have a wonderful day",
+    "This is so cute",
+    "Beautiful view, where is this?",
+    "Good morning everyone",
+    "I agree, well said",
+    "Interesting article, thanks",
+    "Awesome work, keep it up",
+    "Looks delicious",
+    "Welcome to the team",
+    "Hope you feel better soon",
+    "What a great game last night",
+    "Love this song",
+    "Thank you so much for the help",
+    "Can't wait for the weekend",
+    "Have a safe trip",
+    "Good luck with the exam",
+    "That's hilarious",
+    "Amazing, congratulations",
+    "Ok sounds good",
+    "Yes please",
+    "Lovely family picture",
+    "Well done, proud of you",
+]
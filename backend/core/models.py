@@ -7,6 +7,8 @@ class DecisionRequest(BaseModel):
     text: Optional[str] = None
     image_url: Optional[str] = None
     analysis_results: Optional[dict] = None
+    platform: Optional[str] = None  # x, facebook, reddit (feeds the Hate Weather report)
+    region: Optional[str] = None  # ISO country code
 
 class DecisionResponse(BaseModel):
     """Response from decision engine"""
@@ -16,6 +18,16 @@ class DecisionResponse(BaseModel):
     replacement_content: Optional[str] = None
     empathy_note: Optional[str] = None
 
+class DecisionBatchRequest(BaseModel):
+    """Request model for batch decision engine (e.g. a whole feed page)"""
+    texts: list[str]
+    platform: Optional[str] = None
+    region: Optional[str] = None
+
+class DecisionBatchResponse(BaseModel):
+    """Decisions for a batch, in input order"""
+    results: list[DecisionResponse]
+
 class AlternativeRequest(BaseModel):
     """Request for generating alternative text"""
     original_text: str
@@ -0,0 +1,221 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import html
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import feedparser
+import httpx
+
+from backend.core import config
+from backend.core.cache import normalize_text
+from backend.core.cards import CardStore, card_store
+
+# --- Sources ---
+REAL_NEWS_RSS = [
+    "http://feeds.bbci.co.uk/news/world/rss.xml",
+    "https://www.reutersagency.com/feed/?best-topics=political-general&post_type=best",
+    "https://rss.nytimes.com/services/xml/rss/nyt/HomePage.xml",
+    "http://feeds.npr.org/1001/rss.xml"
+]
+
+# Satire is a good proxy for "Fake" news in a game context
+SATIRE_NEWS_RSS = [
+    "https://www.theonion.com/rss",
+    "https://babylonbee.com/feed"
+]
+
+
+class _FeedState(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    items: List[dict]
+
+
+def parse_feed(content: bytes, limit: int) -> List[dict]:
+    """Parse RSS/Atom bytes into headline items (CPU-bound: run in a worker thread)"""
+    feed = feedparser.parse(content)
+    source = feed.feed.title if 'title' in feed.feed else "News Source"
+    items = []
+    for entry in feed.entries[:limit]:
+        if 'title' not in entry:
+            continue
+        items.append({
+            "text": html.unescape(entry.title),
+            "source": source,
+            "explanation": "This is a real headline from a reputable news source."
+        })
+    return items
+
+
+class FeedFetcher:
+    """
+    Fetches feeds over one pooled keep-alive HTTP client.
+    Sends If-None-Match / If-Modified-Since from the last response, so an
+    unchanged feed costs a 304 and reuses the items parsed last time.
+    """
+
+    def __init__(self, timeout: float, per_feed: int):
+        self.timeout = timeout
+        self.per_feed = per_feed
+        self._client: Optional[httpx.AsyncClient] = None
+        self._state: Dict[str, _FeedState] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.parsed = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                headers={"User-Agent": "Click-or-Cap/1.0 (+headline game)"},
+            )
+        return self._client
+
+    async def fetch(self, url: str) -> List[dict]:
+        state = self._state.get(url)
+        headers = {}
+        if state is not None:
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+
+        self.requests += 1
+        try:
+            response = await self.client.get(url, headers=headers)
+            if response.status_code == 304 and state is not None:
+                self.not_modified += 1
+                return state.items
+            response.raise_for_status()
+            items = await asyncio.to_thread(parse_feed, response.content, self.per_feed)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error fetching {url}: {e}")
+            # Serve what we parsed last time rather than dropping the feed
+            return state.items if state is not None else []
+
+        self.parsed += 1
+        self._state[url] = _FeedState(
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            items=items,
+        )
+        return items
+
+    async def fetch_all(self, urls: List[str]) -> List[dict]:
+        results = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return [item for items in results for item in items]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "parsed": self.parsed,
+            "errors": self.errors,
+        }
+
+
+def _dedupe(items: List[dict]) -> List[dict]:
+    seen = set()
+    unique = []
+    for item in items:
+        key = normalize_text(item["text"])
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+class HeadlinePool:
+    """
+    Pre-parsed, deduplicated headlines kept in memory and refreshed in the
+    background, so /game/deck never waits on an upstream feed.
+    A failed or empty refresh keeps the previous pool. Each refresh also
+    feeds the persistent card store and scores its new cards.
+    """
+
+    def __init__(self, fetcher: FeedFetcher, store: CardStore, interval_seconds: float):
+        self.fetcher = fetcher
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.real: List[dict] = []
+        self.satire: List[dict] = []
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        try:
+            real, satire = await asyncio.gather(
+                self.fetcher.fetch_all(REAL_NEWS_RSS),
+                self.fetcher.fetch_all(SATIRE_NEWS_RSS),
+            )
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Headline refresh failed: {e}")
+            return
+        # Swap whole lists so readers never see a half-built pool
+        if real:
+            self.real = _dedupe(real)
+        if satire:
+            self.satire = [{**item, "explanation": "This is a satirical or fake headline."}
+                           for item in _dedupe(satire)]
+        self.refreshes += 1
+        self.refreshed_at = time.time()
+
+        # SQLite writes run off the event loop, like UserStore and VerdictCache
+        await asyncio.to_thread(self.store.add, self.real, "real")
+        await asyncio.to_thread(self.store.add, self.satire, "satire")
+        try:
+            await self.store.classify_pending(config.CARD_CLASSIFY_BATCH)
+        except Exception as e:
+            print(f"Card classification failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.fetcher.aclose()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "real": len(self.real),
+            "satire": len(self.satire),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "age_seconds": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            "interval_seconds": self.interval_seconds,
+            "feeds": self.fetcher.stats(),
+            "store": self.store.stats(),
+        }
+
+
+headline_pool = HeadlinePool(
+    FeedFetcher(timeout=config.NEWS_FETCH_TIMEOUT, per_feed=config.NEWS_POOL_PER_FEED),
+    card_store,
+    interval_seconds=config.NEWS_REFRESH_SECONDS,
+)
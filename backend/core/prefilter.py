@@ -0,0 +1,227 @@
+# pyre-ignore-all-errors[21]
+import math
+import re
+import zlib
+from typing import Dict, Generic, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+
+from backend.core import config
+from backend.core.cache import normalize_text
+from backend.core.lexicon import (
+    AMBIGUOUS_PHRASES, EXTENSION_WORDS, HATE_SPEECH_EXAMPLES, SAFE_EXAMPLES, THREAT_PHRASES
+)
+
+T = TypeVar("T")
+
+
+class AhoCorasick(Generic[T]):
+    """Multi-pattern matcher: finds every lexicon term in one pass over the text"""
+
+    def __init__(self, patterns: Dict[str, T]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, T]]] = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value: T) -> None:
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((pattern, value))
+
+    def _build(self) -> None:
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[nxt] = candidate if candidate != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> Iterator[Tuple[int, str, T]]:
+        """Yield (start index, pattern, value) for every match"""
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern, value in self._out[state]:
+                yield i - len(pattern) + 1, pattern, value
+
+
+class LocalVerdict(NamedTuple):
+    score: float
+    reason: str
+
+
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_REPEATS = re.compile(r"(.)\1{2,}")
+_TOKEN = re.compile(r"[a-z0-9']+")
+_RATING = re.compile(r"Rating[:\s]+(\d+)", re.IGNORECASE)
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by do does for from had has have i i'm if in is it it's "
+    "its me my of on or our so that the their them then there these they this to was we were "
+    "what when where which who will with you your you're".split()
+)
+
+HASH_DIM = 1 << 18
+
+
+class LocalPrefilter:
+    """
+    Tiered local classifier that runs before the LLM:
+    1. Aho-Corasick lexicon of slurs/threats -> confident HIDE
+       (context-dependent phrases only ever defer)
+    2. Hashing-vectorizer logistic regression -> confident ALLOW
+    Everything in between is deferred to the LLM. The model keeps learning
+    from the LLM's verdicts on deferred texts.
+    """
+
+    def __init__(self, warn_threshold: float, hide_threshold: float, margin: float, learning_rate: float = 0.1):
+        self.margin = margin
+        self.allow_below = warn_threshold - margin
+        self.hide_at = hide_threshold + margin
+        self.learning_rate = learning_rate
+
+        lexicon: Dict[str, Tuple[int, bool]] = dict(EXTENSION_WORDS)
+        for phrase, severity in {**THREAT_PHRASES, **AMBIGUOUS_PHRASES}.items():
+            lexicon[phrase] = (severity, True)
+        self._matcher: AhoCorasick[Tuple[int, bool]] = AhoCorasick(lexicon)
+
+        self._weights: Dict[int, float] = {}
+        self._bias = -2.0
+
+        self.total = 0
+        self.local_allow = 0
+        self.local_hide = 0
+        self.deferred = 0
+        self.learned = 0
+        self.fallbacks = 0
+
+        self._seed()
+
+    # --- lexicon ---
+
+    def lexicon_hits(self, text: str) -> List[Tuple[str, int]]:
+        """Return (term, severity) for every lexicon term in text"""
+        scan = _REPEATS.sub(r"\1", _NON_WORD.sub(" ", normalize_text(text).translate(_LEET)))
+        scan = f" {' '.join(scan.split())} "
+        hits = []
+        for start, term, (severity, whole_word) in self._matcher.search(scan):
+            end = start + len(term)
+            if whole_word and (scan[start - 1].isalnum() or scan[end].isalnum()):
+                continue
+            hits.append((term, severity))
+        return hits
+
+    # --- model ---
+
+    def _features(self, text: str) -> List[int]:
+        tokens = [t for t in _TOKEN.findall(normalize_text(text)) if t not in STOPWORDS]
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(g.encode("utf-8")) % HASH_DIM for g in grams]
+
+    def model_score(self, text: str) -> Tuple[float, float]:
+        """Return (toxicity 0-100, share of content tokens the model has seen)"""
+        features = self._features(text)
+        if not features:
+            return 50.0, 0.0
+        z = self._bias + sum(self._weights.get(f, 0.0) for f in features)
+        known = sum(1 for f in features if f in self._weights)
+        return 100.0 / (1.0 + math.exp(-z)), known / len(features)
+
+    def learn(self, text: str, score: float, learning_rate: Optional[float] = None) -> None:
+        """One SGD step of logistic regression towards a 0-100 target score"""
+        features = self._features(text)
+        if not features:
+            return
+        predicted, _ = self.model_score(text)
+        gradient = (score - predicted) / 100.0 * (learning_rate or self.learning_rate)
+        for f in features:
+            self._weights[f] = self._weights.get(f, 0.0) + gradient
+        self._bias += gradient * 0.1
+
+    def observe(self, text: str, analysis: str) -> None:
+        """Learn from an LLM analysis of a deferred text"""
+        match = _RATING.search(analysis)
+        if match and config.PREFILTER_ONLINE_LEARNING:
+            self.learn(text, min(100.0, float(match.group(1))))
+            self.learned += 1
+
+    def _seed(self) -> None:
+        toxic = [e["title"] for e in HATE_SPEECH_EXAMPLES] + list(THREAT_PHRASES)
+        toxic += [f"you are a {word}" for word, (severity, _) in EXTENSION_WORDS.items() if severity >= 50]
+        for _ in range(50):
+            for text in toxic:
+                self.learn(text, 95.0, learning_rate=0.5)
+            for text in SAFE_EXAMPLES:
+                self.learn(text, 2.0, learning_rate=0.5)
+
+    # --- tiered decision ---
+
+    def classify(self, text: str) -> Optional[LocalVerdict]:
+        """Return a confident local verdict, or None to defer to the LLM"""
+        self.total += 1
+        hits = self.lexicon_hits(text)
+        if hits:
+            term, severity = max(hits, key=lambda h: h[1])
+            if severity >= self.hide_at and term not in AMBIGUOUS_PHRASES:
+                self.local_hide += 1
+                return LocalVerdict(float(severity), f"Contains a slur or threat (\"{term}\").")
+            self.deferred += 1
+            return None
+
+        score, coverage = self.model_score(text)
+        if score < self.allow_below and coverage >= config.PREFILTER_MIN_COVERAGE:
+            self.local_allow += 1
+            return LocalVerdict(round(score), "No toxic language detected by the local filter.")
+
+        self.deferred += 1
+        return None
+
+    def estimate(self, text: str) -> LocalVerdict:
+        """Best-effort local score for when the LLM is unavailable"""
+        self.fallbacks += 1
+        hits = self.lexicon_hits(text)
+        if hits:
+            term, severity = max(hits, key=lambda h: h[1])
+            return LocalVerdict(float(severity), f"Contains flagged language (\"{term}\").")
+        score, coverage = self.model_score(text)
+        if coverage < 0.5:
+            # Mostly unseen vocabulary: warn rather than guess either way
+            return LocalVerdict(self.allow_below + self.margin, "Could not be verified right now.")
+        return LocalVerdict(round(score), "Estimated by the local filter.")
+
+    def stats(self) -> Dict[str, float]:
+        answered = self.local_allow + self.local_hide
+        return {
+            "enabled": config.PREFILTER_ENABLED,
+            "total": self.total,
+            "local_allow": self.local_allow,
+            "local_hide": self.local_hide,
+            "deferred_to_llm": self.deferred,
+            "local_share": round(answered / self.total, 4) if self.total else 0.0,
+            "learned_from_llm": self.learned,
+            "fallbacks": self.fallbacks,
+            "vocabulary": len(self._weights),
+        }
+
+
+prefilter = LocalPrefilter(
+    warn_threshold=config.WARN_THRESHOLD,
+    hide_threshold=config.HIDE_THRESHOLD,
+    margin=config.PREFILTER_MARGIN,
+)
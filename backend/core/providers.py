@@ -0,0 +1,259 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import random
+import re
+import zlib
+from typing import AsyncIterator, Callable, Optional
+
+from backend.core import config
+
+
+class LLMProviderError(Exception):
+    """Raised by providers; status_code mirrors the HTTP status when there is one"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMProvider(ABC):
+    """
+    Minimal chat interface the AI layer talks to.
+    Messages use Mistral's shape; providers translate where needed.
+    """
+    name = "base"
+
+    def __init__(self, text_model: str, image_model: str):
+        self.text_model = text_model
+        self.image_model = image_model
+
+    @abstractmethod
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        """Full completion text"""
+
+    @abstractmethod
+    def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Completion text as it is generated"""
+
+
+class MistralProvider(LLMProvider):
+    """Mistral / Pixtral via the official SDK"""
+    name = "mistral"
+
+    def __init__(self, api_key: str, text_model: str = "mistral-small-latest", image_model: str = "pixtral-12b-2409"):
+        super().__init__(text_model, image_model)
+        from mistralai import Mistral
+        self.client = Mistral(api_key=api_key or "missing_key")
+
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        chat_response = await self.client.chat.complete_async(
+            model=model or self.text_model,
+            messages=messages,
+            response_format={"type": "json_object"} if json_mode else None,
+        )
+        if chat_response is None or not chat_response.choices:
+            raise LLMProviderError("Mistral returned no choices")
+        content = chat_response.choices[0].message.content
+        return content if isinstance(content, str) else ""
+
+    async def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        response = await self.client.chat.stream_async(
+            model=model or self.text_model,
+            messages=messages
+        )
+        async for chunk in response:
+            delta = chunk.data.choices[0].delta.content
+            if delta and isinstance(delta, str):
+                yield delta
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any OpenAI-compatible chat API (OpenAI, Groq, Gemini's OpenAI endpoint)"""
+
+    def __init__(self, name: str, api_key: str, text_model: str, image_model: str, base_url: Optional[str] = None):
+        super().__init__(text_model, image_model)
+        from openai import AsyncOpenAI
+        self.name = name
+        self.client = AsyncOpenAI(api_key=api_key or "missing_key", base_url=base_url)
+
+    @staticmethod
+    def _translate(messages: list) -> list:
+        # Mistral takes image_url as a plain string, OpenAI wants {"url": ...}
+        translated = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, list):
+                content = [
+                    {"type": "image_url", "image_url": {"url": part["image_url"]}}
+                    if part.get("type") == "image_url" and isinstance(part.get("image_url"), str) else part
+                    for part in content
+                ]
+            translated.append({**message, "content": content})
+        return translated
+
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        from openai import omit
+        chat_response = await self.client.chat.completions.create(
+            model=model or self.text_model,
+            messages=self._translate(messages),
+            response_format={"type": "json_object"} if json_mode else omit,
+        )
+        return chat_response.choices[0].message.content or ""
+
+    async def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=model or self.text_model,
+            messages=self._translate(messages),
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local stand-in for load tests and CI (no keys, no network).
+    Answers every prompt shape ai.py uses, with configurable latency and errors.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 100, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        super().__init__("fake-text", "fake-vision")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+    @staticmethod
+    def _prompt(messages: list) -> str:
+        content = messages[-1]["content"]
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return content
+
+    @staticmethod
+    def _rating(text: str) -> int:
+        return zlib.crc32(text.encode("utf-8")) % 101
+
+    async def _delay(self) -> None:
+        delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000.0)
+        if self._random.random() < self.error_rate:
+            raise LLMProviderError(f"Fake provider error {self.error_status}", status_code=self.error_status)
+
+    def _answer(self, prompt: str, json_mode: bool) -> str:
+        rating = self._rating(prompt)
+        if not json_mode:
+            if "Rating:" in prompt or "toxicity rating" in prompt:
+                return f"Rating: {rating}\nReason: Deterministic fake verdict."
+            if "POLITE:" in prompt:
+                return "POLITE: Thanks for sharing.\nEDUCATIONAL: Here are the facts.\nFIRM: Please keep it civil."
+            return "Let's keep this conversation kind and constructive."
+        if '"results"' in prompt:
+            items = re.findall(r'^\s*(\d+)\. (".*")$', prompt, re.MULTILINE)
+            return json.dumps({"results": [
+                {"id": int(i), "rating": self._rating(t), "reason": "Deterministic fake verdict.",
+                 "rewrite": "Let's keep this conversation kind and constructive."}
+                for i, t in items
+            ]})
+        if '"polite"' in prompt:
+            return json.dumps({"polite": "Thanks for sharing.", "educational": "Here are the facts.",
+                               "firm": "Please keep it civil."})
+        return json.dumps({"rating": rating, "reason": "Deterministic fake verdict.",
+                           "rewrite": "Let's keep this conversation kind and constructive."})
+
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        await self._delay()
+        return self._answer(self._prompt(messages), json_mode)
+
+    async def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        await self._delay()
+        for token in re.findall(r"\S+\s*", self._answer(self._prompt(messages), False)):
+            yield token
+
+
+class FailoverProvider(LLMProvider):
+    """Try providers in order; a stream only fails over before its first token"""
+
+    def __init__(self, providers: list):
+        super().__init__(providers[0].text_model, providers[0].image_model)
+        self.providers = providers
+        self.name = ",".join(p.name for p in providers)
+        self.failovers = 0
+
+    def _model_for(self, provider: LLMProvider, model: Optional[str]) -> Optional[str]:
+        # Model names are provider-specific: map the primary's names onto the fallback's
+        if model == self.image_model:
+            return provider.image_model
+        return provider.text_model
+
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        error: Optional[Exception] = None
+        for provider in self.providers:
+            try:
+                return await provider.complete(messages, model=self._model_for(provider, model), json_mode=json_mode)
+            except Exception as e:
+                error = e
+                self.failovers += 1
+        raise error  # type: ignore
+
+    async def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        error: Optional[Exception] = None
+        for provider in self.providers:
+            sent = False
+            try:
+                async for token in provider.stream(messages, model=self._model_for(provider, model)):
+                    sent = True
+                    yield token
+                return
+            except Exception as e:
+                if sent:
+                    raise
+                error = e
+                self.failovers += 1
+        raise error  # type: ignore
+
+
+# Known OpenAI-compatible endpoints: name -> (api key, base_url, text model, image model)
+_OPENAI_COMPATIBLE = {
+    "openai": (lambda: config.OPENAI_API_KEY, None, "gpt-4o-mini", "gpt-4o-mini"),
+    "groq": (lambda: config.GROQ_API_KEY, "https://api.groq.com/openai/v1",
+             "llama-3.1-8b-instant", "meta-llama/llama-4-scout-17b-16e-instruct"),
+    "gemini": (lambda: config.GEMINI_API_KEY, "https://generativelanguage.googleapis.com/v1beta/openai/",
+               "gemini-2.0-flash", "gemini-2.0-flash"),
+}
+
+
+def build_provider(name: str, mistral_api_key: str = "") -> LLMProvider:
+    name = name.strip().lower()
+    if name == "mistral":
+        return MistralProvider(api_key=mistral_api_key)
+    if name == "fake":
+        return FakeProvider(
+            latency_ms=config.FAKE_LLM_LATENCY_MS,
+            jitter_ms=config.FAKE_LLM_JITTER_MS,
+            error_rate=config.FAKE_LLM_ERROR_RATE,
+            error_status=config.FAKE_LLM_ERROR_STATUS,
+            seed=config.FAKE_LLM_SEED,
+        )
+    if name in _OPENAI_COMPATIBLE:
+        api_key, base_url, text_model, image_model = _OPENAI_COMPATIBLE[name]
+        return OpenAICompatibleProvider(name, api_key() or "", text_model, image_model, base_url=base_url)
+    raise ValueError(f"Unknown LLM provider '{name}' (expected mistral, openai, groq, gemini or fake)")
+
+
+def get_provider(mistral_api_key: str = "", wrap: Optional[Callable[[LLMProvider], LLMProvider]] = None) -> LLMProvider:
+    """
+    Build the provider chain named by LLM_PROVIDER (comma-separated = failover order)
+    wrap is applied to each provider in the chain (e.g. upstream.governed)
+    """
+    names = [n for n in config.LLM_PROVIDER.split(",") if n.strip()] or ["mistral"]
+    providers = [build_provider(n, mistral_api_key) for n in names]
+    if wrap is not None:
+        providers = [wrap(p) for p in providers]
+    return providers[0] if len(providers) == 1 else FailoverProvider(providers)
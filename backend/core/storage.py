@@ -0,0 +1,292 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.core import config
+
+
+
+class UserRecord(NamedTuple):
+    user_id: str
+    username: str
+    score: int
+    actions_count: int
+
+
+class ActionResult(NamedTuple):
+    action_id: int
+    points: int
+    timestamp: float
+    user: UserRecord
+    duplicate: bool = False  # idempotency key already seen: nothing was applied
+
+
+class ActionItem(NamedTuple):
+    user_id: str
+    action_type: str
+    points: int
+    idempotency_key: Optional[str] = None
+
+
+class UserStore:
+    """
+    SQLite (WAL) storage for users and their actions.
+    Reads go straight to the database, so every uvicorn worker sees the same
+    data; they are blocking, so async callers run them in a worker thread
+    (asyncio.to_thread), each with its own connection. Writes go through one writer task per process that commits queued
+    operations in batches (one transaction per batch), absorbing bursts of
+    POST /users/action without per-request fsyncs.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 256, batch_wait_ms: float = 5,
+                 dedupe_window_seconds: float = 86400):
+        self.db_path = db_path
+        self.dedupe_window_seconds = dedupe_window_seconds
+        self._pruned_at = 0.0
+        self.duplicates = 0
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000.0
+        self._local = threading.local()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.writes = 0
+        self.max_batch = 0
+        self.commit_seconds = 0.0
+
+        db = self._connection()
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "  user_id TEXT PRIMARY KEY, username TEXT NOT NULL,"
+            "  score INTEGER NOT NULL DEFAULT 0, actions_count INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS users_score ON users (score DESC);"
+            "CREATE TABLE IF NOT EXISTS actions ("
+            "  id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,"
+            "  action_type TEXT NOT NULL, points INTEGER NOT NULL, timestamp TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS actions_user ON actions (user_id, id);"
+            "CREATE INDEX IF NOT EXISTS actions_timestamp ON actions (timestamp);"
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "  user_id TEXT NOT NULL, key TEXT NOT NULL, action_id INTEGER NOT NULL, points INTEGER NOT NULL,"
+            "  score INTEGER NOT NULL, actions_count INTEGER NOT NULL, created_at REAL NOT NULL,"
+            "  PRIMARY KEY (user_id, key));"
+            "CREATE INDEX IF NOT EXISTS idempotency_created ON idempotency (created_at);"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread: readers run concurrently with the writer under WAL
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit mode: the writer manages its own BEGIN/COMMIT
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # --- reads ---
+
+    def get_user(self, user_id: str) -> Optional[UserRecord]:
+        row = self._connection().execute(
+            "SELECT user_id, username, score, actions_count FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return UserRecord(*row) if row else None
+
+    def all_users(self) -> List[UserRecord]:
+        rows = self._connection().execute("SELECT user_id, username, score, actions_count FROM users").fetchall()
+        return [UserRecord(*row) for row in rows]
+
+    def user_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def actions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        if user_id is None:
+            rows = self._connection().execute(
+                "SELECT user_id, action_type, points, timestamp FROM actions ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT user_id, action_type, points, timestamp FROM actions WHERE user_id = ? "
+                "ORDER BY id DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [{"user_id": r[0], "action_type": r[1], "points": r[2], "timestamp": r[3]} for r in rows]
+
+    def last_action_id(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM actions").fetchone()[0]
+
+    def users_changed_since(self, action_id: int) -> Tuple[int, List[UserRecord]]:
+        """(latest action id, users with actions after action_id), for syncing in-memory indexes"""
+        db = self._connection()
+        latest = db.execute("SELECT COALESCE(MAX(id), ?) FROM actions", (action_id,)).fetchone()[0]
+        rows = db.execute(
+            "SELECT user_id, username, score, actions_count FROM users WHERE user_id IN "
+            "(SELECT DISTINCT user_id FROM actions WHERE id > ? AND id <= ?)", (action_id, latest)
+        ).fetchall()
+        return latest, [UserRecord(*row) for row in rows]
+
+    def actions_since(self, action_id: int = 0, since: Optional[datetime] = None) -> List[Tuple[int, str, int, float]]:
+        """(id, user_id, points, epoch seconds) for actions after action_id (and at/after since)"""
+        query = "SELECT id, user_id, points, timestamp FROM actions WHERE id > ?"
+        params: List[Any] = [action_id]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since.isoformat())
+        rows = self._connection().execute(query + " ORDER BY id", params).fetchall()
+        return [(r[0], r[1], r[2], datetime.fromisoformat(r[3]).timestamp()) for r in rows]
+
+    # --- writes (single writer, batched) ---
+
+    async def record_action(self, user_id: str, action_type: str, points: int,
+                            idempotency_key: Optional[str] = None) -> ActionResult:
+        """Award points and log the action; resolves once the batch is committed"""
+        results = await self.record_actions([ActionItem(user_id, action_type, points, idempotency_key)])
+        return results[0]
+
+    async def record_actions(self, items: List[ActionItem]) -> List[ActionResult]:
+        """
+        Apply many actions in one pass (one write op, one transaction).
+        Items whose (user_id, idempotency_key) was seen within the dedupe
+        window are skipped and return the originally recorded result.
+        """
+        now = datetime.now()
+
+        def op(db: sqlite3.Connection) -> List[ActionResult]:
+            self._prune_idempotency(db, now.timestamp())
+            return [self._apply_action(db, item, now) for item in items]
+
+        return await self._submit(op)
+
+    def _apply_action(self, db: sqlite3.Connection, item: ActionItem, now: datetime) -> ActionResult:
+        if item.idempotency_key is not None:
+            seen = db.execute(
+                "SELECT i.action_id, i.points, i.score, i.actions_count, i.created_at, u.username "
+                "FROM idempotency i JOIN users u ON u.user_id = i.user_id "
+                "WHERE i.user_id = ? AND i.key = ?", (item.user_id, item.idempotency_key)
+            ).fetchone()
+            if seen is not None:
+                self.duplicates += 1
+                user = UserRecord(item.user_id, seen[5], seen[2], seen[3])
+                return ActionResult(action_id=seen[0], points=seen[1], timestamp=seen[4], user=user, duplicate=True)
+
+        user_id = item.user_id
+        db.execute(
+            "INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)", (user_id, f"User_{user_id[:8]}")
+        )
+        db.execute(
+            "UPDATE users SET score = score + ?, actions_count = actions_count + 1 WHERE user_id = ?",
+            (item.points, user_id),
+        )
+        action_id = db.execute(
+            "INSERT INTO actions (user_id, action_type, points, timestamp) VALUES (?, ?, ?, ?)",
+            (user_id, item.action_type, item.points, now.isoformat()),
+        ).lastrowid or 0
+        row = db.execute(
+            "SELECT user_id, username, score, actions_count FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        user = UserRecord(*row)
+        if item.idempotency_key is not None:
+            db.execute(
+                "INSERT INTO idempotency VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, item.idempotency_key, action_id, item.points, user.score, user.actions_count,
+                 now.timestamp()),
+            )
+        return ActionResult(action_id=action_id, points=item.points, timestamp=now.timestamp(), user=user)
+
+    def _prune_idempotency(self, db: sqlite3.Connection, now: float) -> None:
+        # Bounded dedupe window: forget keys older than the window (at most once a minute)
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        db.execute("DELETE FROM idempotency WHERE created_at < ?", (now - self.dedupe_window_seconds,))
+
+    async def _submit(self, op: Callable[[sqlite3.Connection], Any]) -> Any:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop(self._queue))
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        return await future
+
+    async def _write_loop(self, queue: asyncio.Queue) -> None:
+        stopping = False
+        while not stopping:
+            batch = [await queue.get()]
+            # Let a burst accumulate briefly, then take everything queued up to batch_size
+            if self.batch_wait:
+                await asyncio.sleep(self.batch_wait)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            # None is close()'s stop marker: commit what was taken with it, then exit
+            stopping = None in batch
+            batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+            results = await asyncio.to_thread(self._commit, [op for op, _ in batch])
+            for (_, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit(self, ops: List[Callable[[sqlite3.Connection], Any]]) -> List[Tuple[bool, Any]]:
+        db = self._connection()
+        results: List[Tuple[bool, Any]] = []
+        started = time.monotonic()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            for op in ops:
+                # A failing op rolls back alone (savepoint) without losing the rest of the batch
+                db.execute("SAVEPOINT op")
+                try:
+                    results.append((True, op(db)))
+                    db.execute("RELEASE op")
+                except Exception as e:
+                    db.execute("ROLLBACK TO op")
+                    db.execute("RELEASE op")
+                    results.append((False, e))
+            db.execute("COMMIT")
+        except Exception as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            return [(False, e)] * len(ops)
+        self.batches += 1
+        self.writes += len(ops)
+        self.max_batch = max(self.max_batch, len(ops))
+        self.commit_seconds += time.monotonic() - started
+        return results
+
+    async def close(self) -> None:
+        """Stop the writer once everything queued so far, including the batch in progress, is committed"""
+        writer, queue = self._writer, self._queue
+        if writer is None or queue is None:
+            return
+        if not writer.done():
+            await queue.put(None)
+            await writer
+        self._writer = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "db_path": self.db_path,
+            "batches": self.batches,
+            "writes": self.writes,
+            "max_batch": self.max_batch,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "avg_commit_ms": round(self.commit_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "duplicates_dropped": self.duplicates,
+        }
+
+
+user_store = UserStore(
+    config.USERS_DB_PATH,
+    batch_size=config.USERS_WRITE_BATCH_SIZE,
+    batch_wait_ms=config.USERS_WRITE_BATCH_WAIT_MS,
+    dedupe_window_seconds=config.IDEMPOTENCY_WINDOW_SECONDS,
+)
@@ -0,0 +1,296 @@
+# pyre-ignore-all-errors[21]
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, IO, List, NamedTuple, Optional, Tuple
+
+from backend.core import config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: queries fall back to plain loops
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # No advisory locks (Windows): a single process owns the history file
+    fcntl = None
+
+MAGIC = b"HWTS0001"
+KEY_BYTES = 48
+FIELDS = 4  # bucket index, verdict count, score sum, flagged (HIDE + WARN) count
+ALL = "*"
+MAX_WRITERS = 64  # worker files: path, path.1, path.2, ...
+
+
+class Resolution(NamedTuple):
+    name: str
+    seconds: int
+    slots: int
+
+
+# Stored resolutions, finest first: 24 h of minutes, 30 days of hours, 2 years of days
+RESOLUTIONS = (
+    Resolution("minute", 60, 1440),
+    Resolution("hour", 3600, 720),
+    Resolution("day", 86400, 730),
+)
+
+
+class TrendPoint(NamedTuple):
+    start: float
+    count: int
+    toxicity: Optional[float]
+    flagged: int
+
+
+class TimeSeriesStore:
+    """
+    Fixed-memory Hate Weather history in memory-mapped files.
+    Every (platform, region) series has a ring buffer per resolution
+    (minute / hour / day); each slot remembers which time bucket it holds,
+    so stale slots read as empty without any cleanup pass. Every verdict is
+    rolled up into all resolutions as it arrives, and queries at other
+    steps are downsampled from the coarsest resolution that divides the step.
+    Each worker process locks and writes its own file (path, path.1, ...);
+    queries sum the series of every worker's file. Once all series slots
+    are taken, the series written least recently is recycled if it has
+    been idle for idle_seconds.
+    """
+
+    def __init__(self, path: str, max_series: int = 128, idle_seconds: float = 7 * 86400):
+        self.base_path = path
+        self.max_series = max_series
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.recycled = 0
+
+        self._header = struct.Struct(f"<8sI{len(RESOLUTIONS)}I")
+        self._keys_offset = self._header.size
+        data_offset = self._keys_offset + max_series * KEY_BYTES
+        data_offset += -data_offset % 8
+        self._bases: List[int] = []
+        size = data_offset
+        for resolution in RESOLUTIONS:
+            self._bases.append((size - data_offset) // 8)
+            size += max_series * resolution.slots * FIELDS * 8
+        self._data_offset = data_offset
+        self._size = size
+        self._expected = self._header.pack(MAGIC, max_series, *(r.slots for r in RESOLUTIONS))
+
+        self.path, self._file = self._claim()
+        self._file.seek(0)
+        if os.fstat(self._file.fileno()).st_size != size or self._file.read(self._header.size) != self._expected:
+            # New file, or the layout changed: start an empty history
+            self._file.seek(0)
+            self._file.truncate(0)
+            self._file.truncate(size)
+            self._file.write(self._expected)
+            self._file.flush()
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._data = memoryview(self._mmap)[data_offset:].cast("d")
+
+        self._series = self._read_keys(self._mmap)
+        self._slots: List[Optional[Tuple[str, str]]] = [None] * max_series
+        for key, index in self._series.items():
+            self._slots[index] = key
+        # Last write per series, to the day: the newest bucket in its day ring
+        day = len(RESOLUTIONS) - 1
+        self._written: List[float] = [0.0] * max_series
+        for index in self._series.values():
+            base = self._offset(day, index, 0)
+            newest = max(self._data[base + slot * FIELDS] for slot in range(RESOLUTIONS[day].slots))
+            self._written[index] = newest * RESOLUTIONS[day].seconds
+        self._peers: Dict[str, mmap.mmap] = {}
+
+    def _claim(self) -> Tuple[str, IO[bytes]]:
+        """Open and lock the first history file no other live process holds"""
+        for n in range(MAX_WRITERS if fcntl is not None else 1):
+            path = self.base_path if n == 0 else f"{self.base_path}.{n}"
+            f = open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+            if fcntl is None:
+                return path, f
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            return path, f
+        raise RuntimeError(f"More than {MAX_WRITERS} processes are writing {self.base_path}")
+
+    def _read_keys(self, buffer: mmap.mmap) -> Dict[Tuple[str, str], int]:
+        series: Dict[Tuple[str, str], int] = {}
+        for index in range(self.max_series):
+            start = self._keys_offset + index * KEY_BYTES
+            key = buffer[start:start + KEY_BYTES].rstrip(b"\0").decode("utf-8", "replace")
+            if "|" in key:
+                platform, region = key.split("|", 1)
+                series[(platform, region)] = index
+        return series
+
+    def _write_key(self, index: int, key: Tuple[str, str]) -> None:
+        start = self._keys_offset + index * KEY_BYTES
+        encoded = f"{key[0]}|{key[1]}".encode("utf-8")[:KEY_BYTES]
+        self._mmap[start:start + KEY_BYTES] = encoded.ljust(KEY_BYTES, b"\0")
+
+    def _index(self, platform: str, region: str, now: float) -> Optional[int]:
+        key = (platform, region)
+        index = self._series.get(key)
+        if index is not None:
+            return index
+        if len(self._series) < self.max_series:
+            index = self._slots.index(None)
+        else:
+            index = min(range(self.max_series), key=self._written.__getitem__)
+            if now - self._written[index] < self.idle_seconds:
+                self.dropped += 1
+                return None
+            # Recycle the least recently written series: clear its rings before reuse
+            old = self._slots[index]
+            if old is not None:
+                del self._series[old]
+            for r, resolution in enumerate(RESOLUTIONS):
+                start = self._data_offset + self._offset(r, index, 0) * 8
+                self._mmap[start:start + resolution.slots * FIELDS * 8] = bytes(resolution.slots * FIELDS * 8)
+            self.recycled += 1
+        self._write_key(index, key)
+        self._slots[index] = key
+        self._series[key] = index
+        return index
+
+    def _offset(self, r: int, series: int, slot: int) -> int:
+        return self._bases[r] + (series * RESOLUTIONS[r].slots + slot) * FIELDS
+
+    def record(self, score: float, flagged: bool, platform: Optional[str], region: Optional[str],
+               now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        keys = {(ALL, ALL), (platform or ALL, ALL), (ALL, region or ALL), (platform or ALL, region or ALL)}
+        data = self._data
+        with self._lock:
+            for platform_key, region_key in keys:
+                series = self._index(platform_key, region_key, now)
+                if series is None:
+                    continue
+                self._written[series] = max(self._written[series], now)
+                for r, resolution in enumerate(RESOLUTIONS):
+                    bucket = int(now // resolution.seconds)
+                    i = self._offset(r, series, bucket % resolution.slots)
+                    if data[i] != bucket:
+                        if data[i] > bucket:
+                            continue  # already overwritten by a newer lap of the ring
+                        # Slot still holds an older lap of the ring: reset it
+                        data[i] = bucket
+                        data[i + 1] = data[i + 2] = data[i + 3] = 0.0
+                    data[i + 1] += 1
+                    data[i + 2] += score
+                    data[i + 3] += flagged
+
+    # --- queries ---
+
+    def _peer_buffers(self) -> List[mmap.mmap]:
+        """Read-only maps of the other workers' files (current or from earlier runs)"""
+        for n in range(MAX_WRITERS):
+            path = self.base_path if n == 0 else f"{self.base_path}.{n}"
+            if path == self.path or path in self._peers or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size != self._size or f.read(self._header.size) != self._expected:
+                        continue
+                    self._peers[path] = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+            except OSError:
+                continue
+        return list(self._peers.values())
+
+    @staticmethod
+    def _pick(step: int) -> int:
+        # Coarser resolutions also keep more history, so use the coarsest one that divides the step
+        return max(r for r, resolution in enumerate(RESOLUTIONS) if step % resolution.seconds == 0)
+
+    def _add_totals(self, buffer: mmap.mmap, series: int, r: int, lo: int, hi: int, first: int, step: int,
+                    totals: List[List[float]]) -> None:
+        resolution = RESOLUTIONS[r]
+        offset = self._data_offset + self._offset(r, series, 0) * 8
+        if np is not None:
+            block = np.frombuffer(buffer, dtype=np.float64, count=resolution.slots * FIELDS,
+                                  offset=offset).reshape(resolution.slots, FIELDS)
+            buckets = np.arange(lo, hi + 1)
+            rows = block[buckets % resolution.slots]
+            valid = rows[:, 0] == buckets
+            groups = (buckets * resolution.seconds) // step - first
+            for field in range(3):
+                sums = np.bincount(groups, weights=np.where(valid, rows[:, field + 1], 0), minlength=len(totals))
+                for g, value in enumerate(sums.tolist()):
+                    totals[g][field] += value
+            del block
+            return
+        view = memoryview(buffer)[offset:offset + resolution.slots * FIELDS * 8]
+        block = view.cast("d")
+        try:
+            for bucket in range(lo, hi + 1):
+                i = (bucket % resolution.slots) * FIELDS
+                if block[i] != bucket:
+                    continue
+                group = totals[(bucket * resolution.seconds) // step - first]
+                group[0] += block[i + 1]
+                group[1] += block[i + 2]
+                group[2] += block[i + 3]
+        finally:
+            block.release()
+            view.release()
+
+    def query(self, platform: Optional[str], region: Optional[str], start: float, end: float,
+              step: int) -> List[TrendPoint]:
+        """Points from start to end, step seconds apart (rounded to whole minutes and aligned to the step)"""
+        finest = RESOLUTIONS[0].seconds
+        step = max(finest, int(step) // finest * finest)
+        first = int(start // step)
+        last = int(end // step)
+        r = self._pick(step)
+        resolution = RESOLUTIONS[r]
+        lo = first * step // resolution.seconds
+        hi = (last + 1) * step // resolution.seconds - 1
+        key = (platform or ALL, region or ALL)
+        totals = [[0.0, 0.0, 0.0] for _ in range(last - first + 1)]
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._add_totals(self._mmap, series, r, lo, hi, first, step, totals)
+            for buffer in self._peer_buffers():
+                series = self._read_keys(buffer).get(key)
+                if series is not None:
+                    self._add_totals(buffer, series, r, lo, hi, first, step, totals)
+        return [
+            TrendPoint(
+                start=(first + g) * step,
+                count=int(count),
+                toxicity=round(total / count, 1) if count else None,
+                flagged=int(flag),
+            )
+            for g, (count, total, flag) in enumerate(totals)
+        ]
+
+    def flush(self) -> None:
+        self._mmap.flush()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "series": len(self._series),
+            "max_series": self.max_series,
+            "bytes": len(self._mmap),
+            "dropped_series": self.dropped,
+            "recycled_series": self.recycled,
+            "file": self.path,
+            "worker_files": 1 + len(self._peers),
+            "vectorized": np is not None,
+        }
+
+
+weather_history = TimeSeriesStore(
+    config.WEATHER_HISTORY_PATH,
+    max_series=config.WEATHER_HISTORY_MAX_SERIES,
+    idle_seconds=config.WEATHER_HISTORY_IDLE_SECONDS,
+)
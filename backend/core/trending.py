@@ -0,0 +1,166 @@
+# pyre-ignore-all-errors[21]
+import hashlib
+import math
+import re
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from backend.core import config
+from backend.core.cache import normalize_text
+
+_TOKEN = re.compile(r"#\w+|\w+(?:'\w+)?")
+MAX_TOKENS_PER_TEXT = 64
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be because been but by can could did do does for from had has
+have he her him his how i if in into is it its just me more my no not now of on one only or our out she so some
+than that the their them then there these they this those to too up us was we were what when which who why will with
+would you your
+""".split())
+
+
+def extract_terms(text: str) -> List[str]:
+    """Hashtags, words and word bigrams of a text (stopwords and very short words skipped)"""
+    words = [
+        word for word in _TOKEN.findall(normalize_text(text))[:MAX_TOKENS_PER_TEXT]
+        if word.startswith("#") or (len(word) > 2 and word not in STOPWORDS and not word.isdigit())
+    ]
+    terms = set(words)
+    terms.update(f"{a} {b}" for a, b in zip(words, words[1:]) if not a.startswith("#") and not b.startswith("#"))
+    return list(terms)
+
+
+class CountMinSketch:
+    """
+    Fixed-size Count-Min Sketch (depth rows of width counters).
+    Estimates never undercount; the overcount is bounded by the total
+    weight times e / width with probability 1 - e^-depth.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = array("d", bytes(8 * width * depth))
+
+    def _cells(self, term: str) -> List[int]:
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, term: str, weight: float) -> float:
+        """Conservative update: only raise the counters that hold the minimum; returns the new estimate"""
+        cells = self._cells(term)
+        table = self.table
+        estimate = min(table[c] for c in cells) + weight
+        for c in cells:
+            if table[c] < estimate:
+                table[c] = estimate
+        return estimate
+
+    def estimate(self, term: str) -> float:
+        return min(self.table[c] for c in self._cells(term))
+
+    def scale(self, factor: float) -> None:
+        table = self.table
+        for i in range(len(table)):
+            table[i] *= factor
+
+
+class TrendingTerms:
+    """
+    Time-decayed heavy hitters over the terms of flagged (WARN / HIDE) texts,
+    in fixed memory: a Count-Min Sketch estimates every term's weight and a
+    Space-Saving style table keeps the top `capacity` terms, admitting a new
+    term only when its estimate beats the current minimum.
+    Decay uses forward decay: each new occurrence weighs e^((t - t0) / tau)
+    instead of shrinking every counter over time, and all counters are
+    rescaled once the weights grow large.
+    """
+
+    RESCALE_AT = 1e12
+
+    def __init__(self, half_life_seconds: float = 3600, capacity: int = 256, width: int = 4096, depth: int = 4):
+        self.tau = half_life_seconds / math.log(2)
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.top: Dict[str, float] = {}
+        self._min_term: Optional[str] = None
+        self._t0 = time.time()
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.evictions = 0
+
+    def _rescale(self, now: float) -> None:
+        factor = math.exp(-(now - self._t0) / self.tau)
+        self.sketch.scale(factor)
+        for term in self.top:
+            self.top[term] *= factor
+        self._t0 = now
+
+    def _admit(self, term: str, estimate: float) -> None:
+        top = self.top
+        if term in top:
+            top[term] = estimate
+            if term == self._min_term:
+                self._min_term = None  # the minimum grew: another term may hold it now
+            return
+        if len(top) < self.capacity:
+            top[term] = estimate
+            if self._min_term is not None and estimate < top[self._min_term]:
+                self._min_term = term
+            return
+        # Tracked counts only grow and the cached minimum is dropped whenever its own
+        # count changes, so once (re)computed it is the true minimum
+        if self._min_term is None:
+            self._min_term = min(top, key=top.__getitem__)
+        if estimate <= top[self._min_term]:
+            return
+        del top[self._min_term]
+        top[term] = estimate
+        self._min_term = min(top, key=top.__getitem__)
+        self.evictions += 1
+
+    def add(self, text: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        terms = extract_terms(text)
+        if not terms:
+            return
+        with self._lock:
+            if (now - self._t0) / self.tau > math.log(self.RESCALE_AT):
+                self._rescale(now)
+            weight = math.exp((now - self._t0) / self.tau)
+            for term in terms:
+                self._admit(term, self.sketch.add(term, weight))
+            self.texts += 1
+
+    def trending(self, limit: int = 20, now: Optional[float] = None) -> List[Dict[str, object]]:
+        """Top terms by decayed count (each occurrence counts 1, halving every half-life)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            factor = math.exp(-(now - self._t0) / self.tau)
+            ranked = sorted(self.top.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {"term": term, "weight": round(weight * factor, 2), "hashtag": term.startswith("#")}
+            for term, weight in ranked
+            if weight * factor >= 0.01
+        ]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "texts": self.texts,
+            "tracked": len(self.top),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "sketch_bytes": self.sketch.table.itemsize * len(self.sketch.table),
+        }
+
+
+trending = TrendingTerms(
+    half_life_seconds=config.TRENDING_HALF_LIFE_SECONDS,
+    capacity=config.TRENDING_CAPACITY,
+    width=config.TRENDING_SKETCH_WIDTH,
+    depth=config.TRENDING_SKETCH_DEPTH,
+)
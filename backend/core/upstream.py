@@ -0,0 +1,272 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+from backend.core import config
+from backend.core.providers import LLMProvider, LLMProviderError
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(LLMProviderError):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    # mistralai.SDKError, openai.APIStatusError and LLMProviderError all carry status_code
+    status = getattr(error, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Transport errors (httpx.ConnectError, ReadTimeout, ...) have no status code
+    return "timeout" in type(error).__name__.lower() or "connect" in type(error).__name__.lower()
+
+
+class UpstreamGovernor:
+    """
+    Shared guard for one upstream provider:
+    - token bucket sized to the provider quota + concurrency semaphore
+    - per-call timeout
+    - retries with full-jitter exponential backoff on 429/5xx/timeouts
+    - circuit breaker that fails fast while the provider is unhealthy
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rate_per_sec: float, burst: int,
+                 max_retries: int, backoff_base: float, backoff_max: float, timeout: float,
+                 failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+        self.state = "closed"  # closed -> open -> half_open -> closed
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    # --- rate limiting ---
+
+    async def _take_token(self) -> None:
+        if self.rate_per_sec <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_sec)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate_per_sec)
+
+    # --- circuit breaker ---
+
+    def _admit(self) -> bool:
+        """Raise if the breaker rejects the call; True if this call is the half-open probe"""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit open", status_code=503)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit half-open, probe in flight", status_code=503)
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def _record(self, ok: bool, probe: bool) -> None:
+        # Only the probe frees the probe slot: calls admitted before the breaker opened may finish late
+        if probe:
+            self._probe_in_flight = False
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = "closed"
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # --- entry points ---
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn under the governor, retrying transient upstream failures"""
+        self.calls += 1
+        attempt = 0
+        while True:
+            probe = self._admit()
+            try:
+                await self._take_token()
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        result = await asyncio.wait_for(fn(), timeout=self.timeout)
+                    finally:
+                        self.in_flight -= 1
+            except asyncio.CancelledError:
+                if probe:
+                    self._probe_in_flight = False
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                retryable = is_retryable(e)
+                # Only provider health problems trip the breaker, not e.g. a bad request
+                if retryable:
+                    self._record(ok=False, probe=probe)
+                elif probe:
+                    self._probe_in_flight = False
+                if not retryable or attempt >= self.max_retries or self.state == "open":
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            self._record(ok=True, probe=probe)
+            return result
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Stream under the governor; the timeout and retries only cover the first token"""
+        self.calls += 1
+        attempt = 0
+        while True:
+            probe = self._admit()
+            acquired = False
+            sent = False
+            try:
+                # Waiting here can be cancelled too: it must release a half-open probe slot
+                await self._take_token()
+                await self._semaphore.acquire()
+                acquired = True
+                self.in_flight += 1
+                iterator = open_stream().__aiter__()
+                try:
+                    first = await asyncio.wait_for(iterator.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    self._record(ok=True, probe=probe)
+                    return
+                sent = True
+                self._record(ok=True, probe=probe)
+                probe = False  # the slot is released: a later cancel must not free another call's probe
+                yield first
+                async for token in iterator:
+                    yield token
+                return
+            except asyncio.CancelledError:
+                if probe:
+                    self._probe_in_flight = False
+                raise
+            except Exception as e:
+                if sent:
+                    raise
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                retryable = is_retryable(e)
+                if retryable:
+                    self._record(ok=False, probe=probe)
+                elif probe:
+                    self._probe_in_flight = False
+                if not retryable or attempt >= self.max_retries or self.state == "open":
+                    raise
+            finally:
+                if acquired:
+                    self.in_flight -= 1
+                    self._semaphore.release()
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_per_sec": self.rate_per_sec,
+            "tokens_available": round(self._tokens, 2),
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rejected_by_breaker": self.rejected,
+        }
+
+
+class GovernedProvider(LLMProvider):
+    """Provider wrapper that routes every call through an UpstreamGovernor"""
+
+    def __init__(self, inner: LLMProvider, governor: UpstreamGovernor):
+        super().__init__(inner.text_model, inner.image_model)
+        self.inner = inner
+        self.governor = governor
+        self.name = inner.name
+
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        return await self.governor.call(lambda: self.inner.complete(messages, model=model, json_mode=json_mode))
+
+    def stream(self, messages: list, model: Optional[str] = None) -> AsyncIterator[str]:
+        return self.governor.stream(lambda: self.inner.stream(messages, model=model))
+
+
+# One governor per upstream provider, exposed through /health/metrics
+governors: Dict[str, UpstreamGovernor] = {}
+
+
+def governed(provider: LLMProvider) -> LLMProvider:
+    governor = governors.get(provider.name)
+    if governor is None:
+        governor = UpstreamGovernor(
+            name=provider.name,
+            max_concurrency=config.UPSTREAM_MAX_CONCURRENCY,
+            rate_per_sec=config.UPSTREAM_RATE_PER_SEC,
+            burst=config.UPSTREAM_BURST,
+            max_retries=config.UPSTREAM_MAX_RETRIES,
+            backoff_base=config.UPSTREAM_BACKOFF_BASE,
+            backoff_max=config.UPSTREAM_BACKOFF_MAX,
+            timeout=config.UPSTREAM_TIMEOUT,
+            failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=config.CIRCUIT_RESET_SECONDS,
+        )
+        governors[provider.name] = governor
+    return GovernedProvider(provider, governor)
+
+
+def upstream_stats() -> Dict[str, Dict[str, object]]:
+    return {name: governor.stats() for name, governor in governors.items()}
@@ -0,0 +1,318 @@
+# pyre-ignore-all-errors[21]
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.core import config
+from backend.core.broadcast import Broadcaster
+from backend.core.timeseries import weather_history
+from backend.core.trending import trending
+
+PLATFORMS = ["x", "facebook", "reddit"]
+
+# Countries shown on the weather map (other ISO codes are tracked as they appear)
+COUNTRIES = [
+    {"name": "United States", "code": "US"},
+    {"name": "United Kingdom", "code": "GB"},
+    {"name": "India", "code": "IN"},
+    {"name": "Brazil", "code": "BR"},
+    {"name": "Germany", "code": "DE"},
+    {"name": "France", "code": "FR"},
+    {"name": "Japan", "code": "JP"},
+    {"name": "Australia", "code": "AU"},
+    {"name": "Canada", "code": "CA"},
+    {"name": "Mexico", "code": "MX"},
+    {"name": "South Africa", "code": "ZA"},
+    {"name": "Nigeria", "code": "NG"},
+    {"name": "Spain", "code": "ES"},
+    {"name": "Italy", "code": "IT"},
+    {"name": "South Korea", "code": "KR"},
+]
+COUNTRY_NAMES = {c["code"]: c["name"] for c in COUNTRIES}
+
+_PLATFORM_ALIASES = {"twitter": "x", "x.com": "x", "twitter.com": "x", "facebook.com": "facebook",
+                     "fb": "facebook", "reddit.com": "reddit"}
+_REGION = re.compile("[A-Z]{2}")
+
+
+def get_severity(level: float) -> str:
+    """Classify toxicity level into weather severity"""
+    if level < 25:
+        return "calm"
+    elif level < 45:
+        return "moderate"
+    elif level < 65:
+        return "stormy"
+    else:
+        return "severe"
+
+
+def normalize_platform(platform: Optional[str]) -> Optional[str]:
+    if not platform:
+        return None
+    platform = platform.strip().lower()
+    # Hostnames from the extension: www.reddit.com, old.reddit.com, mobile.twitter.com, ...
+    if "." in platform:
+        for domain, name in _PLATFORM_ALIASES.items():
+            if "." in domain and (platform == domain or platform.endswith("." + domain)):
+                return name
+    platform = _PLATFORM_ALIASES.get(platform, platform)
+    # Bounded cardinality: unknown platforms share one bucket
+    return platform if platform in PLATFORMS else "other"
+
+
+def normalize_region(region: Optional[str]) -> Optional[str]:
+    if not region:
+        return None
+    region = region.strip().upper()
+    # ASCII letters only: str.isalpha() would also accept "ÉÜ" and friends
+    return region if _REGION.fullmatch(region) else None
+
+
+class EncodedView(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def encode_view(view: object) -> EncodedView:
+    body = json.dumps(view, separators=(",", ":")).encode("utf-8")
+    return EncodedView(body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"')
+
+
+def sse_message(event: str, data: object) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+def diff_views(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Only the global view / platform entries / region entries that changed"""
+    delta: Dict[str, object] = {}
+    if old.get("global") != new["global"]:
+        delta["global"] = new["global"]
+    for name, key in (("platforms", "platform"), ("regions", "countryCode")):
+        before = {entry[key]: entry for entry in old.get(name, [])}
+        changed = [entry for entry in new[name] if before.get(entry[key]) != entry]
+        if changed:
+            delta[name] = changed
+    return delta
+
+
+class WeatherCell:
+    """
+    Counters plus two exponentially time-decayed mean scores: a fast one (the
+    current level) and a slow one (the baseline the trend compares against).
+    Each mean is a decayed sum over a decayed weight, so bursts of verdicts
+    and quiet periods are both weighted correctly.
+    """
+    __slots__ = ("total", "hide", "warn", "allow", "fast_sum", "fast_weight", "slow_sum", "slow_weight",
+                 "updated_at")
+
+    def __init__(self):
+        self.total = 0
+        self.hide = 0
+        self.warn = 0
+        self.allow = 0
+        self.fast_sum = self.fast_weight = 0.0
+        self.slow_sum = self.slow_weight = 0.0
+        self.updated_at = 0.0
+
+    def add(self, score: float, action: str, now: float, fast_tau: float, slow_tau: float) -> None:
+        dt = max(0.0, now - self.updated_at)
+        fast_decay = math.exp(-dt / fast_tau)
+        slow_decay = math.exp(-dt / slow_tau)
+        self.fast_sum = self.fast_sum * fast_decay + score
+        self.fast_weight = self.fast_weight * fast_decay + 1.0
+        self.slow_sum = self.slow_sum * slow_decay + score
+        self.slow_weight = self.slow_weight * slow_decay + 1.0
+        self.total += 1
+        if action == "HIDE":
+            self.hide += 1
+        elif action == "WARN":
+            self.warn += 1
+        else:
+            self.allow += 1
+        self.updated_at = now
+
+    @property
+    def fast(self) -> float:
+        return self.fast_sum / self.fast_weight if self.fast_weight else 0.0
+
+    @property
+    def slow(self) -> float:
+        return self.slow_sum / self.slow_weight if self.slow_weight else 0.0
+
+    @property
+    def level(self) -> int:
+        return round(self.fast)
+
+    @property
+    def trend(self) -> str:
+        delta = self.fast - self.slow
+        if delta > config.WEATHER_TREND_DELTA:
+            return "up"
+        if delta < -config.WEATHER_TREND_DELTA:
+            return "down"
+        return "stable"
+
+
+class WeatherAggregator:
+    """
+    In-process streaming aggregate of decision-engine verdicts: globally,
+    per platform, per region and per (region, platform).
+    Updates run on the event loop thread, so plain counters need no locks.
+    A tick task rebuilds the endpoint snapshots only when something changed
+    and pre-encodes each one to JSON bytes with a content-hash ETag, so
+    requests just return (or 304) the latest bytes. The same tick publishes
+    one encoded delta (changed entries only) to every stream subscriber.
+    """
+
+    def __init__(self, fast_seconds: float, slow_seconds: float, tick_seconds: float):
+        self.fast_tau = fast_seconds
+        self.slow_tau = slow_seconds
+        self.tick_seconds = tick_seconds
+        self.cells: Dict[Tuple[str, ...], WeatherCell] = {}
+        self.version = 0
+        self._built_version = -1
+        self.snapshot: Dict[str, Any] = {}
+        self.encoded: Dict[str, EncodedView] = {}
+        self._started_at = time.time()
+        self.stream = Broadcaster(config.WEATHER_STREAM_QUEUE, config.WEATHER_STREAM_MAX_SUBSCRIBERS)
+        self.stream_snapshot = b""
+        self._last_publish = time.time()
+        self._task: Optional[asyncio.Task] = None
+        self._build()
+
+    def _cell(self, key: Tuple[str, ...]) -> WeatherCell:
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = WeatherCell()
+        return cell
+
+    def record(self, score: float, action: str, platform: Optional[str] = None, region: Optional[str] = None,
+               text: Optional[str] = None) -> None:
+        """Fold one verdict into every aggregate it belongs to (flagged texts also feed trending terms)"""
+        now = time.time()
+        platform = normalize_platform(platform)
+        region = normalize_region(region)
+        keys: List[Tuple[str, ...]] = [("global",)]
+        if platform:
+            keys.append(("platform", platform))
+        if region:
+            keys.append(("region", region))
+            if platform:
+                keys.append(("region", region, platform))
+        for key in keys:
+            self._cell(key).add(score, action, now, self.fast_tau, self.slow_tau)
+        flagged = action in ("HIDE", "WARN")
+        weather_history.record(score, flagged, platform, region, now)
+        if flagged and text:
+            trending.add(text, now)
+        self.version += 1
+
+    # --- snapshots ---
+
+    def _build(self) -> None:
+        empty = WeatherCell()
+
+        def stamp(cell: WeatherCell) -> str:
+            # Time of the cell's last verdict, so views that did not change keep their ETag
+            return datetime.fromtimestamp(cell.updated_at or self._started_at).isoformat()
+
+        world = self.cells.get(("global",), empty)
+        global_view = {
+            "platform": "global",
+            "toxicityLevel": world.level,
+            "severity": get_severity(world.level),
+            "trend": world.trend,
+            "lastUpdated": stamp(world),
+            "description": "Global average across all platforms",
+            "analyzed": world.total,
+            "hideCount": world.hide,
+            "warnCount": world.warn,
+            "allowCount": world.allow,
+        }
+
+        platforms = []
+        for name in PLATFORMS:
+            cell = self.cells.get(("platform", name), empty)
+            platforms.append({
+                "platform": name,
+                "toxicityLevel": cell.level,
+                "severity": get_severity(cell.level),
+                "trend": cell.trend,
+                "lastUpdated": stamp(cell),
+                "analyzed": cell.total,
+                "flaggedContent": cell.hide + cell.warn,
+            })
+
+        codes = list(COUNTRY_NAMES) + sorted(
+            key[1] for key in self.cells if len(key) == 2 and key[0] == "region" and key[1] not in COUNTRY_NAMES
+        )
+        regions = []
+        for code in codes:
+            cell = self.cells.get(("region", code), empty)
+            regions.append({
+                "country": COUNTRY_NAMES.get(code, code),
+                "countryCode": code,
+                "toxicityLevel": cell.level,
+                "severity": get_severity(cell.level),
+                "platforms": {p: self.cells.get(("region", code, p), empty).level for p in PLATFORMS},
+                "trend": cell.trend,
+                "lastUpdated": stamp(cell),
+                "analyzed": cell.total,
+            })
+
+        previous = self.snapshot
+        self.snapshot = {"global": global_view, "platforms": platforms, "regions": regions}
+        self.encoded = {name: encode_view(view) for name, view in self.snapshot.items()}
+        # Stream messages are encoded once here and shared by every subscriber
+        self.stream_snapshot = sse_message("snapshot", {"version": self.version, **self.snapshot})
+        delta = diff_views(previous, self.snapshot) if previous else {}
+        if delta:
+            self.stream.publish(sse_message("delta", {"version": self.version, **delta}))
+            self._last_publish = time.time()
+        self._built_version = self.version
+
+    def tick(self) -> bool:
+        """Rebuild snapshots if anything changed since the last tick"""
+        if self.version == self._built_version:
+            return False
+        self._build()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            if not self.tick() and time.time() - self._last_publish >= config.WEATHER_STREAM_KEEPALIVE_SECONDS:
+                # SSE comment line keeps idle connections open through proxies
+                self.stream.publish(b": keepalive\n\n")
+                self._last_publish = time.time()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"cells": len(self.cells), "version": self.version, "snapshot_version": self._built_version,
+                "history": weather_history.stats(), "stream": self.stream.stats(),
+                "trending": trending.stats()}
+
+
+weather = WeatherAggregator(
+    fast_seconds=config.WEATHER_FAST_SECONDS,
+    slow_seconds=config.WEATHER_SLOW_SECONDS,
+    tick_seconds=config.WEATHER_TICK_SECONDS,
+)
@@ -1,6 +1,8 @@
 # pyre-ignore-all-errors[21]  # Pyre cannot see venv packages
+import asyncio
 import io
 import zipfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -16,16 +18,42 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import StreamingResponse
 from backend.routers import decision, users, game, hate_weather
+from backend.core.actionlog import action_log
+from backend.core.ai import provider, single_flight
+from backend.core.cache import image_cache, verdict_cache
+from backend.core.cards import player_seen
+from backend.core.images import upload_stats
+from backend.core.news import headline_pool
+from backend.core.prefilter import prefilter
+from backend.core.storage import user_store
+from backend.core.upstream import upstream_stats
+from backend.core.weather import weather
+from backend.core.timeseries import weather_history
 
 # Paths (project root relative to backend/)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 FRONTEND_DIR = PROJECT_ROOT / "frontend"
 EXTENSION_DIR = PROJECT_ROOT / "AdvancedProfanityFilter-main"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background refresh of the game's headline pool
+    headline_pool.start()
+    weather.start()
+    yield
+    await weather.stop()
+    await headline_pool.stop()
+    await user_store.close()
+    action_log.flush()
+    weather_history.flush()
+    await asyncio.to_thread(verdict_cache.flush, 5)
+
+
 app = FastAPI(
     title="Click-or-Cap API",
     description="Backend for hate speech detection and gamification",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration - Allow all origins for development
@@ -69,11 +97,31 @@ def health_ai():
     import os
     key = os.getenv("MISTRAL_API_KEY", "").strip()
     return {
+        "provider": provider.name,
+        "text_model": provider.text_model,
         "mistral_configured": bool(key and key != "missing_key"),
         "hint": "Add MISTRAL_API_KEY to backend/.env (get key from console.mistral.ai)" if not key else "OK",
     }
 
 
+@app.get("/health/metrics")
+def health_metrics():
+    """Runtime counters for the caching and upstream layers."""
+    return {
+        "verdict_cache": verdict_cache.stats(),
+        "image_cache": image_cache.stats(),
+        "image_uploads": upload_stats,
+        "single_flight": single_flight.stats(),
+        "prefilter": prefilter.stats(),
+        "upstream": upstream_stats(),
+        "headline_pool": headline_pool.stats(),
+        "player_seen": player_seen.stats(),
+        "user_store": user_store.stats(),
+        "action_log": action_log.stats(),
+        "weather": weather.stats(),
+    }
+
+
 @app.get("/download/extension")
 def download_extension():
     """Download the browser extension as a zip file (free option - no Chrome Web Store)."""
@@ -1,20 +1,42 @@
 # pyre-ignore-all-errors[21]  # Pyre cannot see venv packages
+import asyncio
+import binascii
+import json
 import re
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from backend.core.models import (
     DecisionRequest, DecisionResponse,
+    DecisionBatchRequest, DecisionBatchResponse,
     AlternativeRequest, AlternativeResponse,
     EmpathyCheckRequest, EmpathyCheckResponse,
     DeEscalateRequest, DeEscalateResponse
 )
 from backend.core.ai import (
+    FALLBACK_MARKER,
+    IMAGE_MODEL,
+    MODEL_NAME,
+    PROMPT_VERSION,
+    local_analysis,
     analyze_toxicity,
+    analyze_toxicity_llm,
+    analyze_and_rewrite,
+    analyze_toxicity_batch,
     analyze_image,
     generate_reply_options,
-    generate_civilized_version
+    generate_civilized_version,
+    generate_civilized_versions,
+    stream_civilized_version,
+    stream_reply_options
 )
-from typing import Optional
+from backend.core import config
+from backend.core.weather import weather
+from backend.core.cache import Verdict, content_key, image_cache, normalize_text, verdict_cache
+from backend.core.images import (
+    ImageTooLargeError, PreparedImage, decode_image_data, image_data_mime, prepare_image, record_upload
+)
+from typing import AsyncIterator, Callable, Optional, Tuple, Union
 
 router = APIRouter()
 
@@ -23,6 +45,18 @@ class ImageAnalyzeRequest(BaseModel):
     image_data: Optional[str] = None
     image_url: Optional[str] = None
     description: Optional[str] = None
+    platform: Optional[str] = None
+    region: Optional[str] = None
+
+
+# Fallback de-escalation replies, in display order
+DEFAULT_REPLY_OPTIONS = {
+    "polite": "I understand your point.",
+    "educational": "Let's look at the facts.",
+    "firm": "Let's keep this civil.",
+}
+
+_REPLY_LINE = re.compile(r'^[\s\d.*#-]*(POLITE|EDUCATIONAL|FIRM)[\s*]*[:-]\s*(.+)$', re.IGNORECASE)
 
 
 def _parse_ai_rating(text: str) -> tuple[float, str]:
@@ -39,42 +73,144 @@ def _parse_ai_rating(text: str) -> tuple[float, str]:
 
 
 def _score_to_action(score: float) -> str:
-    if score >= 70:
+    if score >= config.HIDE_THRESHOLD:
         return "HIDE"
-    if score >= 30:
+    if score >= config.WARN_THRESHOLD:
         return "WARN"
     return "ALLOW"
 
 
+def _is_ai_error(analysis: str) -> bool:
+    return analysis.startswith("Error") or FALLBACK_MARKER in analysis
+
+
+async def _score_and_rewrite(text: str, needs_rewrite: Callable[[float], bool]) -> tuple[str, Optional[str]]:
+    """
+    Score text and, when needs_rewrite(score), produce a civilized rewrite.
+    See DECISION_REWRITE_MODE for how the two LLM calls are overlapped.
+    """
+    mode = config.DECISION_REWRITE_MODE
+    analysis = local_analysis(text)
+    rewrite = None
+
+    if analysis is None and mode == "combined":
+        analysis, rewrite = await analyze_and_rewrite(text)
+    elif analysis is None and mode == "speculative":
+        rewrite_task = asyncio.create_task(generate_civilized_version(text))
+        try:
+            analysis = await analyze_toxicity_llm(text)
+        except BaseException:
+            rewrite_task.cancel()
+            raise
+        score, _ = _parse_ai_rating(analysis)
+        if needs_rewrite(score):
+            return analysis, await rewrite_task
+        rewrite_task.cancel()
+        return analysis, None
+    elif analysis is None:
+        analysis = await analyze_toxicity_llm(text)
+
+    score, _ = _parse_ai_rating(analysis)
+    if not needs_rewrite(score):
+        return analysis, None
+    if rewrite is None:
+        rewrite = await generate_civilized_version(text)
+    return analysis, rewrite
+
+
+async def _decide(text: str) -> Verdict:
+    """Score text (and rewrite it if needed), serving repeats from the verdict cache."""
+    key = content_key(text, MODEL_NAME, PROMPT_VERSION)
+    cached = await verdict_cache.lookup(key)
+    if cached is not None:
+        return cached
+
+    analysis, replacement = await _score_and_rewrite(text, lambda s: _score_to_action(s) != "ALLOW")
+    score, reason = _parse_ai_rating(analysis)
+    action = _score_to_action(score)
+    verdict = Verdict(score=score, reason=reason, action=action, replacement=replacement)
+
+    # Don't pin provider failures in the cache
+    if not _is_ai_error(analysis):
+        verdict_cache.put(key, verdict)
+    return verdict
+
+
 @router.post("/engine", response_model=DecisionResponse)
 async def decision_engine(request: DecisionRequest):
     """Analyze text for toxicity and return HIDE/WARN/ALLOW decision."""
     if not request.text:
         raise HTTPException(status_code=400, detail="Text is required")
-    analysis = await analyze_toxicity(request.text)
-    score, reason = _parse_ai_rating(analysis)
-    action = _score_to_action(score)
-    replacement = None
-    if action in ("HIDE", "WARN"):
-        replacement = await generate_civilized_version(request.text)
+    verdict = await _decide(request.text)
+    weather.record(verdict.score, verdict.action, request.platform, request.region, request.text)
     return DecisionResponse(
-        action=action,
-        score=score,
-        reason=reason,
-        replacement_content=replacement,
+        action=verdict.action,
+        score=verdict.score,
+        reason=verdict.reason,
+        replacement_content=verdict.replacement,
     )
 
 
-@router.post("/analyze-image")
-async def analyze_image_endpoint(request: ImageAnalyzeRequest):
-    """Analyze image for hate speech using Pixtral vision model."""
-    if not request.image_data and not request.image_url:
-        raise HTTPException(status_code=400, detail="image_data or image_url is required")
-    analysis = await analyze_image(
-        image_data=request.image_data,
-        image_url=request.image_url,
-        description=request.description,
-    )
+@router.post("/engine/batch", response_model=DecisionBatchResponse)
+async def decision_engine_batch(request: DecisionBatchRequest):
+    """
+    Batch Decision Engine
+    Classify many texts (e.g. a whole feed page) in one request. Texts are
+    deduped, served from the verdict cache where possible, and the rest are
+    packed into numbered multi-item prompts. Results come back in input order.
+    """
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts is required")
+    if len(request.texts) > config.DECISION_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=400, detail=f"At most {config.DECISION_BATCH_MAX_TEXTS} texts per batch")
+
+    keys = [content_key(text, MODEL_NAME, PROMPT_VERSION) for text in request.texts]
+    verdicts: dict[str, Verdict] = {}
+    pending: dict[str, str] = {}
+    for key, text in zip(keys, request.texts):
+        if key in verdicts or key in pending:
+            continue
+        if not text.strip():
+            verdicts[key] = Verdict(score=0.0, reason="Empty text", action="ALLOW", replacement=None)
+            continue
+        pending[key] = text
+    # One cache lookup (and at most one disk read) for the whole page
+    for key, cached in (await verdict_cache.lookup_many(list(pending))).items():
+        verdicts[key] = cached
+        del pending[key]
+
+    if pending:
+        pending_keys = list(pending)
+        analyses = await analyze_toxicity_batch([pending[k] for k in pending_keys])
+        scored = []
+        for key, analysis in zip(pending_keys, analyses):
+            score, reason = _parse_ai_rating(analysis)
+            scored.append((key, analysis, score, reason, _score_to_action(score)))
+
+        toxic_keys = [key for key, _, _, _, action in scored if action in ("HIDE", "WARN")]
+        rewrites = dict(zip(toxic_keys, await generate_civilized_versions([pending[k] for k in toxic_keys])))
+
+        for key, analysis, score, reason, action in scored:
+            verdict = Verdict(score=score, reason=reason, action=action, replacement=rewrites.get(key))
+            verdicts[key] = verdict
+            if not _is_ai_error(analysis):
+                verdict_cache.put(key, verdict)
+
+    for key, text in zip(keys, request.texts):
+        weather.record(verdicts[key].score, verdicts[key].action, request.platform, request.region, text)
+
+    return DecisionBatchResponse(results=[
+        DecisionResponse(
+            action=verdicts[key].action,
+            score=verdicts[key].score,
+            reason=verdicts[key].reason,
+            replacement_content=verdicts[key].replacement,
+        )
+        for key in keys
+    ])
+
+
+def _image_result(analysis: str) -> dict:
     if analysis.startswith("Error") or analysis == "No image provided":
         raise HTTPException(status_code=500, detail=analysis)
     score, reason = _parse_ai_rating(analysis)
@@ -87,6 +223,103 @@ async def analyze_image_endpoint(request: ImageAnalyzeRequest):
     }
 
 
+def _record_image(result: dict, platform: Optional[str], region: Optional[str]) -> dict:
+    weather.record(result["score"], result["action"], platform, region)
+    return result
+
+
+ImageBytes = Union[bytes, bytearray, memoryview]
+
+
+def _load_and_prepare(load: Callable[[], ImageBytes]) -> Tuple[ImageBytes, Optional[PreparedImage]]:
+    raw = load()
+    return raw, prepare_image(raw)
+
+
+async def _analyze_image_bytes(load: Callable[[], ImageBytes], mime: str, description: Optional[str]) -> dict:
+    """Shared pipeline for uploaded image bytes: decode, downscale, hash, cache lookup, Pixtral"""
+    context = (IMAGE_MODEL, PROMPT_VERSION, normalize_text(description or ""))
+
+    # Decode once, all off the event loop (base64 too): hash for the cache, downscale/re-encode for upload
+    try:
+        raw, prepared = await asyncio.to_thread(_load_and_prepare, load)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Image data could not be decoded")
+    image_hash = None
+    if prepared is not None:
+        record_upload(prepared)
+        image_hash = prepared.image_hash
+        # Reposted memes (re-encoded, resized) are answered from the perceptual-hash cache
+        cached = image_cache.get(image_hash, context)
+        if cached is not None:
+            return cached
+        raw, mime = prepared.content, prepared.mime
+
+    analysis = await analyze_image(image_bytes=bytes(raw), image_mime=mime, description=description)
+    result = _image_result(analysis)
+    if image_hash is not None:
+        image_cache.put(image_hash, result, context)
+    return result
+
+
+@router.post("/analyze-image")
+async def analyze_image_endpoint(request: ImageAnalyzeRequest):
+    """Analyze image for hate speech using Pixtral vision model."""
+    if request.image_url:
+        analysis = await analyze_image(image_url=request.image_url, description=request.description)
+        return _record_image(_image_result(analysis), request.platform, request.region)
+
+    image_data = request.image_data
+    if not image_data:
+        raise HTTPException(status_code=400, detail="image_data or image_url is required")
+    if len(image_data) * 3 // 4 > config.IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {config.IMAGE_MAX_BYTES} bytes")
+    result = await _analyze_image_bytes(lambda: decode_image_data(image_data), image_data_mime(image_data),
+                                        request.description)
+    return _record_image(result, request.platform, request.region)
+
+
+@router.post("/analyze-image/raw")
+async def analyze_image_raw(request: Request, description: Optional[str] = None,
+                            platform: Optional[str] = None, region: Optional[str] = None):
+    """
+    Analyze an image sent as the raw request body (Content-Type: image/*).
+    The body is streamed into one bounded buffer instead of base64-in-JSON,
+    and only re-encoded as base64 at the provider boundary.
+    """
+    mime = request.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+    if not mime.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Content-Type must be image/*")
+
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > config.IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {config.IMAGE_MAX_BYTES} bytes")
+
+    # Preallocate when the size is known, so chunks are copied straight into place
+    buffer = bytearray(int(declared)) if declared is not None and declared.isdigit() else bytearray()
+    view = memoryview(buffer)
+    size = 0
+    async for chunk in request.stream():
+        end = size + len(chunk)
+        if end > config.IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image larger than {config.IMAGE_MAX_BYTES} bytes")
+        if end <= len(buffer):
+            view[size:end] = chunk
+        else:
+            view.release()
+            buffer.extend(chunk)
+            view = memoryview(buffer)
+        size = end
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty request body")
+
+    body = view[:size]
+    result = await _analyze_image_bytes(lambda: body, mime, description)
+    return _record_image(result, platform, region)
+
+
 @router.post("/generate-alternative", response_model=AlternativeResponse)
 async def generate_alternative(request: AlternativeRequest):
     """
@@ -105,6 +338,24 @@ async def generate_alternative(request: AlternativeRequest):
         improvement_note=f"Rewritten by AI to be more constructive"
     )
 
+def _empathy_score(analysis: str) -> float:
+    # Parse score from string "Rating: 85..."
+    score = 0.0
+    match = re.search(r'Rating[:\s]+(\d+)', analysis, re.IGNORECASE)
+    if match:
+        score = float(match.group(1))
+    return score
+
+
+def _empathy_reaction(score: float) -> tuple[str, str]:
+    """Predicted reaction emoji and warning message for an Empathy Mirror score"""
+    if score > 50:
+        return "😢", "This message seems hurtful. Consider rephrasing."
+    if score > 20:
+        return "😕", "This could be misunderstood."
+    return "😊", "This message looks respectful!"
+
+
 @router.post("/empathy-check", response_model=EmpathyCheckResponse)
 async def empathy_check(request: EmpathyCheckRequest):
     """
@@ -113,28 +364,13 @@ async def empathy_check(request: EmpathyCheckRequest):
     """
     text = request.draft_text
     
-    # Real AI Analysis
-    analysis = await analyze_toxicity(text)
-    
-    # Parse score from string "Rating: 85..."
-    score = 0
-    match = re.search(r'Rating[:\s]+(\d+)', analysis, re.IGNORECASE)
-    if match:
-        score = float(match.group(1))
+    # Real AI Analysis (rewrite overlapped with scoring, see DECISION_REWRITE_MODE)
+    analysis, rewrite = await _score_and_rewrite(text, lambda s: s > 20)
+    score = _empathy_score(analysis)
     
     # Determine reaction
-    if score > 50:
-        emoji = "😢"
-        warning = "This message seems hurtful. Consider rephrasing."
-        civilized = await generate_civilized_version(text)
-    elif score > 20:
-        emoji = "😕"
-        warning = "This could be misunderstood."
-        civilized = await generate_civilized_version(text)
-    else:
-        emoji = "😊"
-        warning = "This message looks respectful!"
-        civilized = text
+    emoji, warning = _empathy_reaction(score)
+    civilized = (rewrite or text) if score > 20 else text
     
     return EmpathyCheckResponse(
         toxicity=score/100.0, # Normalize to 0-1
@@ -153,13 +389,121 @@ async def de_escalate(request: DeEscalateRequest):
     # Note: request.context corresponds to the text we are replying to
     options_dict = await generate_reply_options(request.context)
     
-    options_list = [
-        options_dict.get("polite", "I understand your point."),
-        options_dict.get("educational", "Let's look at the facts."),
-        options_dict.get("firm", "Let's keep this civil.")
-    ]
+    options_list = [options_dict.get(mood, default) for mood, default in DEFAULT_REPLY_OPTIONS.items()]
     
     return DeEscalateResponse(
         options=options_list,
         recommended=options_list[0]
     )
+
+
+# --- Streaming variants (Server-Sent Events) ---
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/empathy-check/stream")
+async def empathy_check_stream(request: EmpathyCheckRequest):
+    """
+    Streaming Empathy Mirror
+    Sends a 'score' event first, then 'token' events of the rewrite as they
+    arrive, then a 'done' event with the full EmpathyCheckResponse.
+    """
+    text = request.draft_text
+
+    async def events():
+        score = _empathy_score(await analyze_toxicity(text))
+        emoji, warning = _empathy_reaction(score)
+        yield _sse("score", {
+            "toxicity": score / 100.0,
+            "action": _score_to_action(score),
+            "predicted_reaction_emoji": emoji,
+            "warning_message": warning,
+        })
+
+        civilized = text
+        if score > 20:
+            parts = []
+            async for token in stream_civilized_version(text):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+            civilized = "".join(parts).strip() or text
+
+        yield _sse("done", EmpathyCheckResponse(
+            toxicity=score / 100.0,
+            predicted_reaction_emoji=emoji,
+            civilized_version=civilized,
+            warning_message=warning,
+        ).model_dump())
+
+    return _event_stream(events())
+
+
+@router.post("/generate-alternative/stream")
+async def generate_alternative_stream(request: AlternativeRequest):
+    """
+    Streaming De-Escalation rewrite
+    Sends 'token' events as the rewrite is generated, then 'done'.
+    """
+    text = request.original_text
+
+    async def events():
+        parts = []
+        async for token in stream_civilized_version(text):
+            parts.append(token)
+            yield _sse("token", {"text": token})
+        yield _sse("done", AlternativeResponse(
+            original=text,
+            alternative="".join(parts).strip() or text,
+            improvement_note="Rewritten by AI to be more constructive",
+        ).model_dump())
+
+    return _event_stream(events())
+
+
+@router.post("/de-escalate/stream")
+async def de_escalate_stream(request: DeEscalateRequest):
+    """
+    Streaming De-Escalation Assistant
+    Sends 'token' events, an 'option' event as each reply completes, then 'done'.
+    """
+
+    async def events():
+        options: dict[str, str] = {}
+        buffer = ""
+
+        def complete_lines(final: bool = False):
+            nonlocal buffer
+            lines = buffer.split("\n")
+            buffer = "" if final else lines.pop()
+            for line in lines:
+                match = _REPLY_LINE.match(line.strip())
+                if match and match.group(1).lower() not in options:
+                    mood = match.group(1).lower()
+                    options[mood] = match.group(2).strip()
+                    yield _sse("option", {"mood": mood, "text": options[mood]})
+
+        async for token in stream_reply_options(request.context):
+            yield _sse("token", {"text": token})
+            buffer += token
+            for event in complete_lines():
+                yield event
+        for event in complete_lines(final=True):
+            yield event
+
+        options_list = [options.get(mood, default) for mood, default in DEFAULT_REPLY_OPTIONS.items()]
+        yield _sse("done", DeEscalateResponse(
+            options=options_list,
+            recommended=options_list[0],
+        ).model_dump())
+
+    return _event_stream(events())
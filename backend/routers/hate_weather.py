@@ -1,125 +1,101 @@
-from fastapi import APIRouter
-from typing import Dict, List
-import random
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
+from datetime import datetime, timezone
+import time
+
+from backend.core import config
 
 router = APIRouter()
 
-# Mock data generators for toxicity statistics
-def generate_toxicity_level() -> int:
-    """Generate a realistic toxicity percentage (0-100)"""
-    return random.randint(15, 75)
+# Live aggregates fed by /decision verdicts; endpoints return the latest pre-encoded snapshot
+from backend.core.weather import PLATFORMS, normalize_platform, normalize_region, weather
+# Minute / hour / day ring buffers of the same verdicts, persisted across restarts
+from backend.core.timeseries import weather_history
+from backend.core.trending import trending
 
-def get_severity(level: int) -> str:
-    """Classify toxicity level into weather severity"""
-    if level < 25:
-        return "calm"
-    elif level < 45:
-        return "moderate"
-    elif level < 65:
-        return "stormy"
-    else:
-        return "severe"
+STEPS = {"minute": 60, "hour": 3600, "day": 86400}
 
-def get_trend() -> str:
-    """Generate random trend direction"""
-    return random.choice(["up", "down", "stable"])
 
-# Country data with realistic toxicity patterns
-COUNTRIES = [
-    {"name": "United States", "code": "US", "base_toxicity": 55},
-    {"name": "United Kingdom", "code": "GB", "base_toxicity": 45},
-    {"name": "India", "code": "IN", "base_toxicity": 60},
-    {"name": "Brazil", "code": "BR", "base_toxicity": 52},
-    {"name": "Germany", "code": "DE", "base_toxicity": 35},
-    {"name": "France", "code": "FR", "base_toxicity": 40},
-    {"name": "Japan", "code": "JP", "base_toxicity": 28},
-    {"name": "Australia", "code": "AU", "base_toxicity": 38},
-    {"name": "Canada", "code": "CA", "base_toxicity": 42},
-    {"name": "Mexico", "code": "MX", "base_toxicity": 48},
-    {"name": "South Africa", "code": "ZA", "base_toxicity": 50},
-    {"name": "Nigeria", "code": "NG", "base_toxicity": 58},
-    {"name": "Spain", "code": "ES", "base_toxicity": 37},
-    {"name": "Italy", "code": "IT", "base_toxicity": 41},
-    {"name": "South Korea", "code": "KR", "base_toxicity": 32},
-]
+def _snapshot_response(request: Request, name: str) -> Response:
+    """Serve a pre-encoded snapshot, or 304 when the client already has it"""
+    encoded = weather.encoded[name]
+    headers = {"ETag": encoded.etag, "Cache-Control": f"public, max-age={config.WEATHER_CACHE_SECONDS}"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if encoded.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
 
 @router.get("/global")
-async def get_global_stats():
+async def get_global_stats(request: Request):
     """Get global toxicity overview"""
-    toxicity_level = generate_toxicity_level()
-    
-    return {
-        "platform": "global",
-        "toxicityLevel": toxicity_level,
-        "severity": get_severity(toxicity_level),
-        "trend": get_trend(),
-        "lastUpdated": datetime.now().isoformat(),
-        "description": "Global average across all platforms"
-    }
+    return _snapshot_response(request, "global")
 
 @router.get("/platforms")
-async def get_platform_stats():
+async def get_platform_stats(request: Request):
     """Get platform-specific toxicity statistics"""
-    platforms = ["x", "facebook", "reddit"]
-    
-    stats = []
-    for platform in platforms:
-        # X tends to be higher, Facebook moderate, Reddit varies
-        base_levels = {"x": 60, "facebook": 45, "reddit": 50}
-        toxicity = base_levels[platform] + random.randint(-10, 10)
-        
-        stats.append({
-            "platform": platform,
-            "toxicityLevel": toxicity,
-            "severity": get_severity(toxicity),
-            "trend": get_trend(),
-            "lastUpdated": datetime.now().isoformat(),
-            "activeUsers": random.randint(100000, 5000000),
-            "flaggedContent": random.randint(1000, 50000)
-        })
-    
-    return stats
+    return _snapshot_response(request, "platforms")
 
 @router.get("/regions")
-async def get_regional_stats():
+async def get_regional_stats(request: Request):
     """Get geographic/regional toxicity breakdown"""
-    regional_data = []
-    
-    for country in COUNTRIES:
-        base = country["base_toxicity"]
-        
-        # Generate platform-specific variations
-        platforms = {
-            "x": base + random.randint(-5, 10),
-            "facebook": base + random.randint(-10, 5),
-            "reddit": base + random.randint(-8, 8)
-        }
-        
-        overall = sum(platforms.values()) // 3
-        
-        regional_data.append({
-            "country": country["name"],
-            "countryCode": country["code"],
-            "toxicityLevel": overall,
-            "severity": get_severity(overall),
-            "platforms": platforms,
-            "trend": get_trend(),
-            "lastUpdated": datetime.now().isoformat()
-        })
-    
-    return regional_data
+    return _snapshot_response(request, "regions")
+
+@router.get("/stream")
+async def stream_weather():
+    """
+    Server-sent events: one `snapshot` event with all views, then `delta`
+    events carrying only the changed global / platform / region entries.
+    Clients that fall behind are disconnected and should reconnect.
+    """
+    subscriber = weather.stream.subscribe(first=weather.stream_snapshot)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers")
+    return StreamingResponse(
+        weather.stream.listen(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/trends")
-async def get_trend_data():
-    """Get historical trend data (mock 7-day history)"""
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    
-    trends = {
-        "x": [random.randint(50, 70) for _ in days],
-        "facebook": [random.randint(35, 55) for _ in days],
-        "reddit": [random.randint(40, 60) for _ in days],
-        "labels": days
-    }
-    
+async def get_trend_data(hours: float = 168, step: str = "day", platform: Optional[str] = None,
+                         region: Optional[str] = None):
+    """
+    Get historical toxicity per platform from the recorded verdict history
+    (step: minute, hour, day or a number of seconds; region: ISO country code)
+    """
+    seconds = STEPS.get(step)
+    if seconds is None:
+        try:
+            seconds = int(step)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="step must be minute, hour, day or a number of seconds")
+    seconds = max(60, seconds // 60 * 60)
+    if hours <= 0 or hours * 3600 / seconds > config.WEATHER_TRENDS_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {config.WEATHER_TRENDS_MAX_POINTS} points per request")
+
+    end = time.time()
+    start = end - hours * 3600 + seconds
+    region = normalize_region(region)
+    names = [normalize_platform(platform) or "other"] if platform else PLATFORMS
+    trends: Dict[str, object] = {}
+    for name in names:
+        points = weather_history.query(name, region, start, end, seconds)
+        trends[name] = [p.toxicity for p in points]
+    points = weather_history.query(None, region, start, end, seconds)
+    trends["global"] = [p.toxicity for p in points]
+    trends["analyzed"] = [p.count for p in points]
+    trends["flagged"] = [p.flagged for p in points]
+    label_format = "%a %d %b" if seconds >= 86400 else "%d %b %H:%M"
+    trends["labels"] = [datetime.fromtimestamp(p.start, timezone.utc).strftime(label_format) for p in points]
+    trends["start"] = [datetime.fromtimestamp(p.start, timezone.utc).isoformat() for p in points]
+    trends["step"] = seconds
     return trends
+
+@router.get("/trending")
+async def get_trending_terms(limit: int = 20):
+    """Get the words, hashtags and phrases driving flagged (WARN/HIDE) content right now"""
+    limit = max(1, min(limit, config.TRENDING_CAPACITY))
+    return {"terms": trending.trending(limit), "halfLifeSeconds": config.TRENDING_HALF_LIFE_SECONDS}
@@ -2,7 +2,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Dict, List, Union
-from datetime import datetime
+import asyncio
+import time
 
 router = APIRouter()
 
@@ -10,12 +11,20 @@ router = APIRouter()
 class UserActionRequest(BaseModel):
     user_id: str
     action_type: str  # civilized_message, reported_hate, de_escalated_thread
+    idempotency_key: Optional[str] = None  # client-generated; retries with the same key are applied once
 
 class UserActionResponse(BaseModel):
     success: bool
     points_earned: int
     new_total_score: int
     badge_unlocked: Optional[str] = None
+    duplicate: bool = False  # retry of an already-applied idempotency key
+
+class UserActionBatchRequest(BaseModel):
+    actions: list[UserActionRequest]
+
+class UserActionBatchResponse(BaseModel):
+    results: list[UserActionResponse]  # in request order
 
 class LeaderboardEntry(BaseModel):
     rank: int
@@ -27,6 +36,14 @@ class LeaderboardResponse(BaseModel):
     entries: list[LeaderboardEntry]
     total_users: int
 
+class RankResponse(BaseModel):
+    user_id: str
+    username: str
+    score: int
+    rank: int
+    total_users: int
+    neighbours: list[LeaderboardEntry]
+
 class WeatherResponse(BaseModel):
     overall_toxicity: float
     total_analyzed: int
@@ -34,23 +51,12 @@ class WeatherResponse(BaseModel):
     warn_count: int
     allow_count: int
 
-# Type definitions for better IDE support
-from typing import TypedDict
-
-class UserDataDict(TypedDict):
-    username: str
-    score: int
-    actions_count: int
-
-# In-memory storage for MVP (replace with Supabase later)
-users_db: Dict[str, UserDataDict] = {}
-actions_db: List[Dict[str, Union[str, int]]] = []
-global_stats: Dict[str, int] = {
-    "total_analyzed": 0,
-    "hide_count": 0,
-    "warn_count": 0,
-    "allow_count": 0
-}
+# Durable storage shared by all workers (SQLite WAL, batched single writer)
+from backend.core import config
+from backend.core.storage import ActionItem, ActionResult, user_store
+from backend.core.leaderboard import leaderboard
+from backend.core.actionlog import action_log
+from backend.core.weather import weather
 
 def get_points_for_action(action_type: str) -> int:
     """Calculate points based on action type"""
@@ -68,37 +74,41 @@ async def log_user_action(request: UserActionRequest):
     Log a user action and award points
     Backend 3 Core Function
     """
-    user_id = request.user_id
-    action_type = request.action_type
-    
-    # Initialize user if not exists
-    if user_id not in users_db:
-        users_db[user_id] = {  # type: ignore
-            "username": f"User_{user_id[:8]}",
-            "score": 0,
-            "actions_count": 0
-        }
-    
     # Calculate points
-    points = get_points_for_action(action_type)
+    points = get_points_for_action(request.action_type)
     
-    # Update user score
-    user_data = users_db[user_id]
-    user_data["score"] = user_data["score"] + points  # type: ignore
-    user_data["actions_count"] = user_data["actions_count"] + 1  # type: ignore
+    # Create the user if needed, update the score and log the action (one batched write)
+    result = await user_store.record_action(request.user_id, request.action_type, points, request.idempotency_key)
+    return _action_response(result, request.action_type)
+
+@router.post("/actions", response_model=UserActionBatchResponse)
+async def log_user_actions(request: UserActionBatchRequest):
+    """
+    Log many user actions in one request (e.g. the extension's offline queue)
+    Applied in one pass; retried idempotency keys are dropped
+    """
+    if len(request.actions) > config.USERS_ACTION_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {config.USERS_ACTION_BATCH_MAX} actions per batch")
     
-    # Log action
-    actions_db.append({
-        "user_id": user_id,
-        "action_type": action_type,
-        "points": points,
-        "timestamp": datetime.now().isoformat()
-    })
+    items = [
+        ActionItem(a.user_id, a.action_type, get_points_for_action(a.action_type), a.idempotency_key)
+        for a in request.actions
+    ]
+    results = await user_store.record_actions(items)
+    return UserActionBatchResponse(
+        results=[_action_response(result, item.action_type) for result, item in zip(results, items)]
+    )
+
+def _action_response(result: ActionResult, action_type: str) -> UserActionResponse:
+    user = result.user
+    points = result.points
+    if not result.duplicate:
+        leaderboard.record(result.action_id, user, points, result.timestamp)
+        action_log.append(user.user_id, action_type, points, result.timestamp)
     
     # Check for badge unlock
     badge: Optional[str] = None
-    user_data = users_db[user_id]
-    score_value = int(user_data["score"])  # type: ignore
+    score_value = user.score
     if score_value >= 100 and score_value < 100 + points:
         badge = "🌟 Kindness Novice"
     elif score_value >= 500 and score_value < 500 + points:
@@ -107,50 +117,80 @@ async def log_user_action(request: UserActionRequest):
     return UserActionResponse(
         success=True,
         points_earned=points,
-        new_total_score=int(user_data["score"]),  # type: ignore
-        badge_unlocked=badge
+        new_total_score=user.score,
+        badge_unlocked=badge,
+        duplicate=result.duplicate
     )
 
 @router.get("/leaderboard", response_model=LeaderboardResponse)
-async def get_leaderboard(limit: int = 10) -> LeaderboardResponse:
+async def get_leaderboard(limit: int = 10, window: str = "all") -> LeaderboardResponse:
     """
-    Get top users by score
+    Get top users by score (window: all, daily or weekly)
     Backend 3 Core Function
     """
-    # Sort users by score
-    sorted_users = sorted(
-        users_db.items(),
-        key=lambda x: int(x[1]["score"]),  # type: ignore
-        reverse=True
-    )[:limit]
+    if window != "all" and window not in leaderboard.windows:
+        raise HTTPException(status_code=400, detail="window must be one of: all, daily, weekly")
+    await leaderboard.sync()
+    if window != "all":
+        # Rolling windows merge pre-aggregated buckets instead of rescanning actions
+        ranked, total = leaderboard.top_window(window, limit)
+        return LeaderboardResponse(entries=_entries(ranked), total_users=total)
     
-    # Format response
-    entries: List[LeaderboardEntry] = []
-    for idx, (user_id, user_data) in enumerate(sorted_users):
-        entries.append(LeaderboardEntry(
-            rank=idx + 1,
-            user_id=user_id,
-            username=str(user_data["username"]),
-            score=int(user_data["score"])  # type: ignore
-        ))
+    # Top-k straight off the ordered index: O(k), no sort
+    entries = _entries(leaderboard.top(limit))
     
     return LeaderboardResponse(
         entries=entries,
-        total_users=len(users_db)
+        total_users=len(leaderboard)
+    )
+
+def _entries(ranked) -> List[LeaderboardEntry]:
+    return [
+        LeaderboardEntry(rank=rank, user_id=user.user_id, username=user.username, score=user.score)
+        for rank, user in ranked
+    ]
+
+@router.get("/rank/{user_id}", response_model=RankResponse)
+async def get_user_rank(user_id: str, radius: int = 2) -> RankResponse:
+    """Get a user's leaderboard position and the users just above and below"""
+    await leaderboard.sync()
+    found = leaderboard.around(user_id, max(0, min(radius, 50)))
+    if found is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    rank, ranked = found
+    neighbours = _entries(ranked)
+    user = neighbours[rank - ranked[0][0]]
+    
+    return RankResponse(
+        user_id=user_id,
+        username=user.username,
+        score=user.score,
+        rank=rank,
+        total_users=len(leaderboard),
+        neighbours=neighbours
     )
 
+@router.get("/actions/summary")
+async def get_actions_summary(hours: float = 24) -> Dict[str, object]:
+    """Action counts and points per action type over the last N hours (columnar log scan)"""
+    since = time.time() - hours * 3600 if hours > 0 else None
+    # Maps newly flushed segments and scans the columns: keep it off the event loop
+    summary = await asyncio.to_thread(action_log.summary, since)
+    return {"hours": hours, **summary}
+
 @router.get("/score/{user_id}")
 async def get_user_score(user_id: str) -> Dict[str, Union[str, int]]:
     """Get individual user score"""
-    if user_id not in users_db:
+    user = await asyncio.to_thread(user_store.get_user, user_id)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    user_data = users_db[user_id]
     return {
         "user_id": user_id,
-        "username": str(user_data["username"]),
-        "score": int(user_data["score"]),  # type: ignore
-        "actions_count": int(user_data["actions_count"])  # type: ignore
+        "username": user.username,
+        "score": user.score,
+        "actions_count": user.actions_count
     }
 
 @router.get("/weather", response_model=WeatherResponse)
@@ -159,33 +199,22 @@ async def get_toxicity_weather():
     Hate Weather Report - Global toxicity stats
     Innovation Feature
     """
-    total = global_stats["total_analyzed"]
+    # Same live aggregate as /hate-weather/global (fed by decision-engine verdicts)
+    global_stats = weather.snapshot["global"]
+    total = global_stats["analyzed"]
     
     if total == 0:
         overall_toxicity = 0
     else:
         # Calculate weighted toxicity
-        hide_weight = global_stats["hide_count"] * 1.0
-        warn_weight = global_stats["warn_count"] * 0.5
+        hide_weight = global_stats["hideCount"] * 1.0
+        warn_weight = global_stats["warnCount"] * 0.5
         overall_toxicity = (hide_weight + warn_weight) / total
     
     return WeatherResponse(
         overall_toxicity=round(overall_toxicity, 2),
         total_analyzed=total,
-        hide_count=global_stats["hide_count"],
-        warn_count=global_stats["warn_count"],
-        allow_count=global_stats["allow_count"]
+        hide_count=global_stats["hideCount"],
+        warn_count=global_stats["warnCount"],
+        allow_count=global_stats["allowCount"]
     )
-
-@router.post("/weather/update")
-async def update_weather_stats(action: str):
-    """Internal endpoint to update global stats"""
-    global_stats["total_analyzed"] += 1
-    if action == "HIDE":
-        global_stats["hide_count"] += 1
-    elif action == "WARN":
-        global_stats["warn_count"] += 1
-    elif action == "ALLOW":
-        global_stats["allow_count"] += 1
-    
-    return {"success": True}
@@ -22,6 +22,14 @@ def test_decision_engine():
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}\n")
 
+def test_decision_engine_batch():
+    """Test batch decision engine endpoint"""
+    print("Testing batch decision engine...")
+    data = {"texts": ["Nice photo!", "I hate you, you are so stupid and dumb", "nice  photo!"]}
+    response = requests.post(f"{BASE_URL}/decision/engine/batch", json=data)
+    print(f"Status: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}\n")
+
 def test_empathy_check():
     """Test empathy mirror feature"""
     print("Testing empathy check (Empathy Mirror)...")
@@ -54,6 +62,18 @@ def test_user_action():
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}\n")
 
+def test_user_actions_batch():
+    """Test batch action ingestion (the repeated idempotency key is applied once)"""
+    print("Testing batch user actions...")
+    data = {"actions": [
+        {"user_id": "test_user_123", "action_type": "reported_hate", "idempotency_key": "evt-1"},
+        {"user_id": "test_user_123", "action_type": "de_escalated_thread", "idempotency_key": "evt-2"},
+        {"user_id": "test_user_123", "action_type": "reported_hate", "idempotency_key": "evt-1"}
+    ]}
+    response = requests.post(f"{BASE_URL}/users/actions", json=data)
+    print(f"Status: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}\n")
+
 def test_leaderboard():
     """Test leaderboard endpoint"""
     print("Testing leaderboard...")
@@ -79,6 +99,7 @@ if __name__ == "__main__":
         print("BACKEND 2: DECISION & INNOVATION FEATURES")
         print("-"*60 + "\n")
         test_decision_engine()
+        test_decision_engine_batch()
         test_empathy_check()
         test_generate_alternative()
         test_de_escalate()
@@ -87,6 +108,7 @@ if __name__ == "__main__":
         print("BACKEND 3: GAMIFICATION & USERS")
         print("-"*60 + "\n")
         test_user_action()
+        test_user_actions_batch()
         test_leaderboard()
         test_weather()
         
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Module-level stores open their files on import: keep them out of the working tree
+_DATA_DIR = tempfile.mkdtemp(prefix="clickorcap-tests-")
+for _name, _file in {
+    "USERS_DB_PATH": "users.db",
+    "CARD_DB_PATH": "cards.db",
+    "ACTION_LOG_DIR": "action_log",
+    "WEATHER_HISTORY_PATH": "weather_history.bin",
+}.items():
+    os.environ.setdefault(_name, os.path.join(_DATA_DIR, _file))
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+from backend.core.actionlog import COMPACTED, ActionLog
+
+NOW = time.time()
+
+
+def _log(directory, **options) -> ActionLog:
+    time.sleep(0.002)  # segment prefixes are per process and millisecond
+    options.setdefault("compact_min_segments", 4)
+    return ActionLog(str(directory), flush_seconds=3600, **options)
+
+
+def _flush_events(log: ActionLog, count: int, timestamp: float = NOW) -> None:
+    for i in range(count):
+        log.append(f"user-{i % 3}", "post", 2, timestamp)
+    log.flush()
+
+
+def test_summary_picks_up_other_workers_segments(tmp_path):
+    reader = _log(tmp_path)
+    writer = _log(tmp_path)
+    _flush_events(writer, 5)
+    summary = reader.summary()
+    assert summary["events"] == 5
+    assert summary["by_action_type"] == {"post": {"count": 5, "points": 10}}
+
+
+def test_compacted_segments_are_not_compacted_again(tmp_path):
+    log = _log(tmp_path)
+    for _ in range(4):
+        _flush_events(log, 2)
+    assert log.compactions == 1
+    for _ in range(3):
+        _flush_events(log, 2)
+    # Three new small segments next to the merged one: below the threshold, nothing to do
+    assert log.compactions == 1
+    assert sum(s.name.endswith(COMPACTED) for s in log.segments) == 1
+    assert log.summary()["events"] == 14
+
+
+def test_own_segments_are_capped(tmp_path):
+    log = _log(tmp_path, compact_min_segments=1000, max_segments=4)
+    for _ in range(10):
+        _flush_events(log, 1)
+    assert len(log.segments) <= 4
+    assert len(os.listdir(tmp_path)) == len(log.segments)
+    assert log.summary()["events"] == 10
+
+
+def test_merged_segment_replaces_its_sources_for_other_workers(tmp_path):
+    writer = _log(tmp_path)
+    reader = _log(tmp_path)
+    for _ in range(3):
+        _flush_events(writer, 1)
+    assert reader.summary()["events"] == 3
+    _flush_events(writer, 1)  # fourth small segment: the writer merges them
+    assert writer.compactions == 1
+    assert reader.summary()["events"] == 4
+
+
+def test_expired_segments_are_deleted(tmp_path):
+    log = _log(tmp_path, retention_seconds=86400)
+    _flush_events(log, 3, timestamp=NOW - 2 * 86400)
+    _flush_events(log, 2)
+    assert log.expired == 1
+    assert len(os.listdir(tmp_path)) == 1
+    assert log.summary()["events"] == 2
+
+
+def test_appends_do_not_wait_for_a_running_summary(tmp_path):
+    log = _log(tmp_path)
+    _flush_events(log, 5)
+    scanning, release = threading.Event(), threading.Event()
+    summarize = log._summarize
+
+    def slow_summarize(sources, since):
+        scanning.set()
+        release.wait(5)
+        return summarize(sources, since)
+
+    log._summarize = slow_summarize  # type: ignore[method-assign]
+    reader = threading.Thread(target=log.summary)
+    reader.start()
+    assert scanning.wait(5)
+    started = time.monotonic()
+    log.append("user-9", "post", 1, NOW)
+    assert time.monotonic() - started < 1
+    release.set()
+    reader.join(5)
+    assert log.stats()["events"] == 6
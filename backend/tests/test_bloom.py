@@ -0,0 +1,73 @@
+import hashlib
+
+from backend.core.cards import BloomFilter, CardStore, SeenSets
+
+
+def _card_id(n: int) -> str:
+    return hashlib.sha256(f"card-{n}".encode("utf-8")).hexdigest()
+
+
+def test_no_false_negatives_and_false_positives_within_bound():
+    bloom = BloomFilter(capacity=2000, error_rate=0.01)
+    added = [_card_id(i) for i in range(2000)]
+    for cid in added:
+        bloom.add(cid)
+    assert bloom.full
+    assert all(cid in bloom for cid in added)
+    others = [_card_id(i) for i in range(2000, 22000)]
+    false_positives = sum(cid in bloom for cid in others)
+    assert false_positives / len(others) < 0.02
+
+
+def test_sizing_follows_the_error_rate():
+    loose = BloomFilter(capacity=1000, error_rate=0.1)
+    tight = BloomFilter(capacity=1000, error_rate=0.001)
+    assert tight.num_bits > loose.num_bits
+    assert tight.num_hashes > loose.num_hashes
+
+
+def test_exhausted_pool_keeps_dealing_full_hands(tmp_path):
+    store = CardStore(str(tmp_path / "cards.db"))
+    store.add([{"text": f"Headline {i}", "source": "test", "explanation": ""} for i in range(10)], "real")
+    seen = SeenSets(max_players=10, capacity=2000, error_rate=0.01).get("player")
+    hands = [store.draw("real", 4, seen) for _ in range(5)]
+    assert [len(hand) for hand in hands] == [4, 4, 4, 4, 4]
+    # Unseen cards come first; repeats only fill hands once the pool is exhausted
+    dealt = [card["id"] for hand in hands for card in hand]
+    assert len(set(dealt[:8])) == 8
+    assert len(set(dealt)) == 10
+    assert all(len({card["id"] for card in hand}) == 4 for hand in hands)
+    hate = [store.draw("hate", 2, seen) for _ in range(5)]
+    assert [len(hand) for hand in hate] == [2] * 5
+
+
+def test_refresh_keeps_card_store_io_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    from backend.core import ai
+    from backend.core.news import FeedFetcher, HeadlinePool
+
+    class Fetcher(FeedFetcher):
+        async def fetch_all(self, feeds):
+            return [{"text": f"Headline {feeds[0]}", "source": "Feed", "explanation": ""}]
+
+    async def ratings(texts):
+        return ["Rating: 10\nReason: fine" for _ in texts]
+
+    store = CardStore(str(tmp_path / "cards.db"))
+    threads = []
+    for name in ("add", "unscored", "set_toxicity"):
+        method = getattr(store, name)
+
+        def traced(*args, _method=method, _name=name):
+            threads.append((_name, threading.current_thread()))
+            return _method(*args)
+
+        monkeypatch.setattr(store, name, traced)
+    monkeypatch.setattr(ai, "analyze_toxicity_batch", ratings)
+
+    asyncio.run(HeadlinePool(Fetcher(timeout=1, per_feed=1), store, interval_seconds=60).refresh())
+    assert {name for name, _ in threads} == {"add", "unscored", "set_toxicity"}
+    assert all(thread is not threading.main_thread() for _, thread in threads)
+    assert store.unscored(100) == []
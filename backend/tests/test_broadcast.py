@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.core.broadcast import Broadcaster
+
+
+def test_slow_subscriber_is_dropped_with_end_of_stream_marker():
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=2)
+        fast = broadcaster.subscribe()
+        slow = broadcaster.subscribe()
+        assert fast is not None and slow is not None
+        received = []
+
+        async def consume():
+            async for message in broadcaster.listen(fast):
+                received.append(message)
+
+        consumer = asyncio.create_task(consume())
+        for n in range(3):
+            broadcaster.publish(b"m%d" % n)
+            await asyncio.sleep(0)  # the fast subscriber keeps up
+
+        # The third message overflowed the slow queue: its backlog is replaced by the marker
+        assert slow.dropped and not fast.dropped
+        assert slow.queue.get_nowait() is None and slow.queue.empty()
+        assert len(broadcaster) == 1
+        assert broadcaster.stats()["dropped_slow"] == 1
+
+        broadcaster.publish(b"m3")
+        await asyncio.sleep(0)
+        assert received == [b"m0", b"m1", b"m2", b"m3"]
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        assert len(broadcaster) == 0
+
+    asyncio.run(scenario())
+
+
+def test_dropped_subscriber_stream_ends():
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=1)
+        slow = broadcaster.subscribe(first=b"hello")
+        assert slow is not None
+        broadcaster.publish(b"overflow")
+        return [message async for message in broadcaster.listen(slow)]
+
+    assert asyncio.run(scenario()) == []
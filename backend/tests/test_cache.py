@@ -0,0 +1,43 @@
+import asyncio
+
+from backend.core.cache import Verdict, VerdictCache
+
+HIDE = Verdict(score=90.0, reason="Threat", action="HIDE", replacement="Please keep it civil.")
+ALLOW = Verdict(score=5.0, reason="Fine", action="ALLOW", replacement=None)
+
+
+def test_writes_are_committed_in_batches_off_the_caller_thread(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    cache = VerdictCache(db_path=path)
+    for i in range(100):
+        cache.put(f"k{i}", ALLOW)
+    assert cache.flush(timeout=5)
+    assert cache.disk_writes == 100
+    assert cache.disk_batches < 100
+
+
+def test_lookup_reads_other_processes_verdicts_from_disk(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    writer = VerdictCache(db_path=path)
+    writer.put("hide", HIDE)
+    writer.put("allow", ALLOW)
+    assert writer.flush(timeout=5)
+
+    reader = VerdictCache(db_path=path)
+    assert reader.get("hide") is None  # memory tier only
+    found = asyncio.run(reader.lookup_many(["hide", "allow", "unknown"]))
+    assert found == {"hide": HIDE, "allow": ALLOW}
+    assert reader.stats()["disk_hits"] == 2
+    # Promoted into memory
+    assert reader.get("hide") == HIDE
+
+
+def test_expired_disk_entries_are_not_served(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    writer = VerdictCache(db_path=path, ttl_seconds=-1)
+    writer.put("old", HIDE)
+    assert writer.flush(timeout=5)
+    reader = VerdictCache(db_path=path)
+    assert asyncio.run(reader.lookup("old")) is None
+    assert reader.flush(timeout=5)
+    assert reader.stats()["expirations"] == 1
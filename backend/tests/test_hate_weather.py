@@ -0,0 +1,31 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import hate_weather
+
+app = FastAPI()
+app.include_router(hate_weather.router, prefix="/hate-weather")
+client = TestClient(app)
+
+
+def test_snapshot_is_served_with_etag():
+    response = client.get("/hate-weather/global")
+    assert response.status_code == 200
+    assert response.headers["etag"] == hate_weather.weather.encoded["global"].etag
+    assert response.content == hate_weather.weather.encoded["global"].body
+    assert "max-age" in response.headers["cache-control"]
+
+
+def test_matching_if_none_match_returns_304():
+    etag = client.get("/hate-weather/platforms").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"stale", W/{etag}', "*"):
+        response = client.get("/hate-weather/platforms", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+
+def test_stale_if_none_match_returns_the_body():
+    response = client.get("/hate-weather/regions", headers={"If-None-Match": '"stale", W/"older"'})
+    assert response.status_code == 200
+    assert response.content == hate_weather.weather.encoded["regions"].body
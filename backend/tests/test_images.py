@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+from backend.core import config  # noqa: E402
+from backend.core.images import ImageTooLargeError, dhash, open_image, prepare_image  # noqa: E402
+
+
+def _jpeg(width: int, height: int, quality: int = 90) -> bytes:
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def test_prepare_downscales_and_hash_survives_reencoding():
+    big = prepare_image(_jpeg(3000, 2000))
+    small = prepare_image(_jpeg(600, 400, quality=60))
+    assert big is not None and small is not None
+    assert max(Image.open(io.BytesIO(big.content)).size) <= config.IMAGE_MAX_SIDE
+    assert bin(big.image_hash ^ small.image_hash).count("1") <= config.IMAGE_HASH_MAX_DISTANCE
+
+
+def test_pixel_cap_is_checked_from_the_header(monkeypatch):
+    monkeypatch.setattr(config, "IMAGE_MAX_PIXELS", 100 * 100)
+    with pytest.raises(ImageTooLargeError):
+        open_image(_jpeg(200, 200))
+    with pytest.raises(ImageTooLargeError):
+        prepare_image(_jpeg(200, 200))
+
+
+def test_non_images_are_not_prepared():
+    assert prepare_image(b"definitely not an image") is None
+
+
+def test_dhash_of_flat_image_is_zero():
+    assert dhash(Image.new("RGB", (32, 32), (10, 20, 30))) == 0
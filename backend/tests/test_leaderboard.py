@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from backend.core.leaderboard import WINDOWS, Leaderboard, RollingWindow
+from backend.core.storage import ActionItem, UserStore
+
+HOUR = 3600
+DAY = 86400
+
+
+def test_daily_window_expires_old_buckets():
+    window = RollingWindow(*WINDOWS["daily"])
+    now = time.time() // HOUR * HOUR  # bucket-aligned; add() drops actions already outside the window
+    window.add("alice", 10, now - 23 * HOUR)
+    window.add("bob", 5, now - HOUR)
+    window.add("alice", 1, now)
+    assert window.top(10, now=now) == [("alice", 11), ("bob", 5)]
+
+    # 24 hourly buckets: alice's first action falls out an hour later
+    assert window.top(10, now=now + HOUR) == [("bob", 5), ("alice", 1)]
+    assert window.top(10, now=now + 23 * HOUR) == [("alice", 1)]
+    assert window.top(10, now=now + 24 * HOUR) == []
+    assert len(window) == 0
+
+
+def test_weekly_window_expires_after_seven_days():
+    window = RollingWindow(*WINDOWS["weekly"])
+    now = time.time() // DAY * DAY  # bucket-aligned; add() drops actions already outside the window
+    window.add("alice", 3, now - 6 * DAY)
+    window.add("bob", 2, now)
+    assert window.top(10, now=now) == [("alice", 3), ("bob", 2)]
+    assert window.top(10, now=now + DAY) == [("bob", 2)]
+    assert window.top(10, now=now + 7 * DAY) == []
+
+
+def test_sync_picks_up_writes_made_outside_this_leaderboard(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=0)
+    board = Leaderboard(store, sync_seconds=0)
+
+    async def run():
+        await store.record_actions([ActionItem("alice", "post", 3), ActionItem("bob", "post", 7)])
+        await board.sync()
+        await store.record_action("alice", "post", 10)
+        await board.sync()
+        await store.close()
+
+    asyncio.run(run())
+    assert [(rank, user.user_id, user.score) for rank, user in board.top(10)] == [(1, "alice", 13), (2, "bob", 7)]
+    assert board.rank("bob") == 2
+
+
+def test_writes_alone_keep_the_window_bounded():
+    window = RollingWindow(*WINDOWS["daily"])
+    start = time.time() // HOUR * HOUR
+    for hour in range(24 * 30):
+        now = start + hour * HOUR
+        window.add(f"user-{hour}", 1, now, now=now)
+    assert len(window._buckets) <= 24
+    assert len(window) == 24
@@ -0,0 +1,40 @@
+import pytest
+
+from backend.core.prefilter import LocalPrefilter
+
+
+@pytest.fixture(scope="module")
+def prefilter():
+    return LocalPrefilter(warn_threshold=40, hide_threshold=70, margin=15)
+
+
+@pytest.mark.parametrize("text", [
+    "He sniggered at the joke",
+    "You would be better off without the extra cheese",
+    "Hang them on the wall",
+    "Cats are animals too",
+    "Shoot them all in one photo session",
+    "Rats are vermin",
+])
+def test_harmless_text_is_never_hidden_locally(prefilter, text):
+    verdict = prefilter.classify(text)
+    assert verdict is None or verdict.score < prefilter.hide_at
+    assert prefilter.estimate(text).score < prefilter.hide_at
+
+
+@pytest.mark.parametrize("text", [
+    "you fucking nigger",
+    "shut up f4ggot",
+    "Just kill yourself",
+    "kys loser",
+    "I will kill you",
+    "Go back to your country!",
+])
+def test_slurs_and_threats_are_hidden_locally(prefilter, text):
+    verdict = prefilter.classify(text)
+    assert verdict is not None and verdict.score >= prefilter.hide_at
+
+
+def test_slurs_match_whole_words_only(prefilter):
+    assert prefilter.lexicon_hits("He sniggered at the joke") == []
+    assert ("nigger", 95) in prefilter.lexicon_hits("what a n1gger")
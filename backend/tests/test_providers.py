@@ -0,0 +1,29 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+import pytest
+
+from backend.core.providers import FailoverProvider, FakeProvider, LLMProvider
+
+
+class _CompleteOnly(LLMProvider):
+    async def complete(self, messages: list, model: Optional[str] = None, json_mode: bool = False) -> str:
+        return ""
+
+
+def test_provider_missing_a_method_cannot_be_built():
+    with pytest.raises(TypeError):
+        _CompleteOnly("text", "image")  # type: ignore[abstract]
+
+
+def test_concrete_providers_implement_both_methods():
+    fake = FakeProvider(latency_ms=0, jitter_ms=0)
+    provider = FailoverProvider([fake])
+
+    async def run() -> str:
+        stream: AsyncIterator[str] = provider.stream([{"role": "user", "content": "hello"}])
+        streamed = "".join([token async for token in stream])
+        completed = await provider.complete([{"role": "user", "content": "hello"}])
+        return streamed if streamed == completed else ""
+
+    assert asyncio.run(run())
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from backend.core.ai import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        @flights.wrap(lambda text: text.lower())
+        async def analyze(text):
+            calls.append(text)
+            await asyncio.sleep(0.01)
+            return text.upper()
+
+        assert await asyncio.gather(analyze("Hi"), analyze("hi")) == ["HI", "HI"]
+        assert len(calls) == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejoin_after_last_waiter_cancels_starts_a_new_call():
+    async def scenario():
+        flights = SingleFlight()
+        started = 0
+
+        @flights.wrap(lambda text: text)
+        async def analyze(text):
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.05)
+            return text
+
+        first = asyncio.create_task(analyze("x"))
+        await asyncio.sleep(0)
+        first.cancel()
+        # Joins before the cancelled shared call has finished unwinding
+        second = asyncio.create_task(analyze("x"))
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "x"
+        assert started == 2
+        await asyncio.sleep(0)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
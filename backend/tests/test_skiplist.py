@@ -0,0 +1,53 @@
+import random
+
+from backend.core.leaderboard import IndexableSkipList
+
+
+def _check(skiplist: IndexableSkipList, expected: list) -> None:
+    assert len(skiplist) == len(expected)
+    assert skiplist.slice(0, len(expected) + 1) == expected
+    for position, key in enumerate(expected):
+        assert skiplist.rank(key) == position
+    for start in (0, 1, len(expected) // 2, len(expected) - 1):
+        assert skiplist.slice(start, 5) == expected[start:start + 5]
+
+
+def test_rank_and_slices_match_a_sorted_list():
+    rng = random.Random(7)
+    skiplist = IndexableSkipList()
+    expected = []
+    for _ in range(500):
+        key = (-rng.randrange(1000), f"user{rng.randrange(10**6):06d}")
+        if key in expected:
+            continue
+        skiplist.insert(key)
+        expected.append(key)
+    expected.sort()
+    _check(skiplist, expected)
+
+    for key in rng.sample(expected, 200):
+        assert skiplist.remove(key)
+        expected.remove(key)
+    _check(skiplist, expected)
+
+
+def test_score_changes_reorder_the_top():
+    skiplist = IndexableSkipList()
+    for key in [(-10, "alice"), (-30, "bob"), (-20, "carol")]:
+        skiplist.insert(key)
+    assert skiplist.slice(0, 3) == [(-30, "bob"), (-20, "carol"), (-10, "alice")]
+    # A score update is a remove plus an insert under the new key
+    skiplist.remove((-10, "alice"))
+    skiplist.insert((-40, "alice"))
+    assert skiplist.slice(0, 2) == [(-40, "alice"), (-30, "bob")]
+    assert skiplist.rank((-20, "carol")) == 2
+
+
+def test_missing_keys():
+    skiplist = IndexableSkipList()
+    assert skiplist.rank((0, "nobody")) is None
+    assert not skiplist.remove((0, "nobody"))
+    assert skiplist.slice(0, 10) == []
+    skiplist.insert((0, "x"))
+    assert skiplist.slice(1, 10) == []
+    assert skiplist.slice(-1, 10) == []
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from backend.core.storage import ActionItem, UserStore
+
+
+def test_close_commits_the_batch_in_progress(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=50)
+
+    async def run():
+        pending = asyncio.ensure_future(store.record_action("u1", "reported_hate", 5))
+        await asyncio.sleep(0.01)  # the writer has taken the write and waits for the batch to fill
+        await store.close()
+        return pending.result()
+
+    result = asyncio.run(run())
+    assert result.user.score == 5
+    assert store.get_user("u1") == result.user
+
+
+def test_close_stops_an_idle_writer(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=0)
+
+    async def run():
+        await store.record_actions([])
+        await store.close()
+        await store.close()
+        return await store.record_action("u1", "reported_hate", 2)
+
+    assert asyncio.run(run()).user.score == 2
+
+
+def test_repeated_key_in_one_batch_is_applied_once(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=0)
+    first, again, other = asyncio.run(store.record_actions([
+        ActionItem("u1", "reported_hate", 5, "k1"),
+        ActionItem("u1", "reported_hate", 5, "k1"),
+        ActionItem("u1", "reported_hate", 5, "k2"),
+    ]))
+    assert not first.duplicate and again.duplicate and not other.duplicate
+    assert again.action_id == first.action_id
+    assert again.user == first.user
+    assert other.user.score == 10
+    assert store.get_user("u1") == other.user
+    assert len(store.actions("u1")) == 2
+
+
+def test_retry_returns_the_original_result(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=0)
+
+    async def run():
+        original = await store.record_action("u1", "reported_hate", 5, idempotency_key="k1")
+        await store.record_action("u1", "reported_hate", 3)
+        retry = await store.record_action("u1", "reported_hate", 5, idempotency_key="k1")
+        return original, retry
+
+    original, retry = asyncio.run(run())
+    assert retry.duplicate and not original.duplicate
+    assert retry._replace(duplicate=False) == original
+    assert retry.user.score == 5
+    assert store.user_count() == 1 and len(store.actions("u1")) == 2
+    assert store.duplicates == 1
+
+
+def test_keys_are_forgotten_after_the_window(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), batch_wait_ms=0, dedupe_window_seconds=0.05)
+
+    async def run():
+        first = await store.record_action("u1", "reported_hate", 5, idempotency_key="k1")
+        time.sleep(0.1)
+        store._pruned_at = 0.0  # pruning runs at most once a minute
+        second = await store.record_action("u1", "reported_hate", 5, idempotency_key="k1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert not second.duplicate
+    assert second.action_id != first.action_id
+    assert second.user.score == 10
+    assert store.get_user("u1") == second.user
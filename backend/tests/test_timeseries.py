@@ -0,0 +1,67 @@
+import pytest
+
+from backend.core.timeseries import RESOLUTIONS, TimeSeriesStore
+from backend.core.weather import normalize_region
+
+MINUTE, HOUR, DAY = (r.seconds for r in RESOLUTIONS)
+NOW = 1_700_000_000 // DAY * DAY
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.bin")
+
+
+def test_minute_ring_wraps_around(path):
+    store = TimeSeriesStore(path, max_series=4)
+    slots = RESOLUTIONS[0].slots
+    store.record(80, True, "x", None, now=NOW)
+    # One full lap later the same slot holds the new minute, and the old one reads as empty
+    store.record(20, False, "x", None, now=NOW + slots * MINUTE)
+    old = store.query("x", None, NOW, NOW, MINUTE)
+    new = store.query("x", None, NOW + slots * MINUTE, NOW + slots * MINUTE, MINUTE)
+    assert [p.count for p in old] == [0]
+    assert [(p.count, p.toxicity, p.flagged) for p in new] == [(1, 20.0, 0)]
+
+
+def test_queries_downsample_to_the_step(path):
+    store = TimeSeriesStore(path, max_series=4)
+    for minute in range(120):
+        store.record(minute % 2 * 100, minute % 2 == 1, "reddit", "FR", now=NOW + minute * MINUTE)
+    points = store.query("reddit", "FR", NOW, NOW + 2 * HOUR - 1, 30 * MINUTE)
+    assert [p.count for p in points] == [30, 30, 30, 30]
+    assert [p.toxicity for p in points] == [50.0] * 4
+    assert [p.flagged for p in points] == [15] * 4
+    # The day step reads the day ring, which saw every verdict
+    assert [p.count for p in store.query(None, None, NOW, NOW, DAY)] == [120]
+
+
+def test_idle_series_are_recycled_when_full(path):
+    store = TimeSeriesStore(path, max_series=3, idle_seconds=DAY)
+    store.record(10, False, "x", None, now=NOW)  # (*, *) and (x, *)
+    store.record(10, False, "reddit", None, now=NOW)  # (reddit, *)
+    store.record(10, False, "facebook", None, now=NOW + HOUR)  # full: facebook is dropped
+    assert store.dropped == 1
+    later = NOW + 2 * DAY
+    store.record(10, False, "facebook", None, now=later)
+    assert store.recycled == 1
+    assert [p.count for p in store.query("facebook", None, later, later, MINUTE)] == [1]
+    assert sum(p.count for p in store.query("x", None, NOW, later, DAY)) + \
+        sum(p.count for p in store.query("reddit", None, NOW, later, DAY)) == 1
+
+
+def test_each_worker_writes_its_own_file_and_queries_sum_them(path):
+    first = TimeSeriesStore(path, max_series=4)
+    second = TimeSeriesStore(path, max_series=4)
+    assert first.path != second.path
+    first.record(100, True, "x", None, now=NOW)
+    second.record(0, False, "x", None, now=NOW)
+    for store in (first, second):
+        assert [(p.count, p.toxicity, p.flagged) for p in store.query("x", None, NOW, NOW, HOUR)] == [(2, 50.0, 1)]
+
+
+def test_regions_are_two_ascii_letters():
+    assert normalize_region(" fr ") == "FR"
+    assert normalize_region("ÉÜ") is None
+    assert normalize_region("F1") is None
+    assert normalize_region("FRA") is None
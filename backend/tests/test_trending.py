@@ -0,0 +1,61 @@
+import math
+import time
+
+from backend.core.trending import CountMinSketch, TrendingTerms
+
+HOUR = 3600
+NOW = time.time()  # the decay origin is the construction time
+
+
+def _weights(trends, now):
+    return {entry["term"]: entry["weight"] for entry in trends.trending(limit=50, now=now)}
+
+
+def test_recent_terms_outrank_older_heavier_ones():
+    trends = TrendingTerms(half_life_seconds=HOUR, capacity=16)
+    for _ in range(3):
+        trends.add("vermin", now=NOW)
+    trends.add("#invasion", now=NOW + 2 * HOUR)
+    ranked = trends.trending(now=NOW + 2 * HOUR)
+    assert [entry["term"] for entry in ranked] == ["#invasion", "vermin"]
+    # Each occurrence counts 1 and halves every half-life
+    assert ranked[0]["weight"] == 1.0
+    assert ranked[1]["weight"] == 0.75
+    assert ranked[0]["hashtag"] is True
+
+
+def test_heavy_hitters_survive_evictions():
+    trends = TrendingTerms(half_life_seconds=HOUR, capacity=4)
+    for i in range(200):
+        trends.add("parasites", now=NOW + i)
+        trends.add(f"noise{i:03d}", now=NOW + i)
+    ranked = trends.trending(now=NOW + 200)
+    assert ranked[0]["term"] == "parasites"
+    weight = ranked[0]["weight"]
+    assert isinstance(weight, float) and math.isclose(weight, 200, rel_tol=0.05)
+    assert trends.stats()["tracked"] == 4
+    assert trends.evictions > 0
+
+
+def test_rescaling_after_a_long_idle_keeps_weights():
+    trends = TrendingTerms(half_life_seconds=60, capacity=8)
+    trends.add("scum", now=NOW)
+    later = NOW + 60 * 60  # far past the rescale point for a one-minute half-life
+    trends.add("scum", now=later)
+    trends.add("scum", now=later)
+    assert _weights(trends, later) == {"scum": 2.0}
+
+
+def test_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    for i in range(500):
+        sketch.add(f"term{i}", 1.0)
+    assert all(sketch.estimate(f"term{i}") >= 1.0 for i in range(500))
+
+
+def test_minimum_that_grew_does_not_block_admission():
+    trends = TrendingTerms(half_life_seconds=1e12, capacity=2)
+    # alpha is the cached minimum when bravo arrives, then keeps growing
+    for word in ["alpha", "bravo"] + ["alpha"] * 5 + ["charlie"] * 5:
+        trends.add(word, now=NOW)
+    assert _weights(trends, NOW) == {"alpha": 6.0, "charlie": 5.0}
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+import pytest
+
+from backend.core.upstream import CircuitOpenError, UpstreamGovernor
+
+
+def _governor(**overrides) -> UpstreamGovernor:
+    options: Dict[str, Any] = dict(name="test", max_concurrency=2, rate_per_sec=0, burst=1, max_retries=0,
+                   backoff_base=0.01, backoff_max=0.01, timeout=1, failure_threshold=1, reset_seconds=30)
+    options.update(overrides)
+    return UpstreamGovernor(**options)
+
+
+def _half_open(governor: UpstreamGovernor) -> None:
+    governor.state = "open"
+    governor._opened_at = time.monotonic() - governor.reset_seconds - 1
+
+
+async def _tokens(*tokens: str):
+    for token in tokens:
+        yield token
+
+
+async def _consume(governor: UpstreamGovernor):
+    return [token async for token in governor.stream(lambda: _tokens("a", "b"))]
+
+
+def test_cancelled_stream_releases_half_open_probe():
+    async def scenario():
+        # Empty token bucket: the probe blocks in the rate limiter before calling the provider
+        governor = _governor(rate_per_sec=1, burst=1)
+        governor._tokens = 0.0
+        _half_open(governor)
+        task = asyncio.create_task(_consume(governor))
+        await asyncio.sleep(0.05)
+        assert governor._probe_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not governor._probe_in_flight
+        assert governor.in_flight == 0
+
+        # The next caller becomes the probe and closes the breaker
+        governor.rate_per_sec = 0
+        assert await _consume(governor) == ["a", "b"]
+        assert governor.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_stream_waiting_for_concurrency_releases_probe():
+    async def scenario():
+        governor = _governor(max_concurrency=1)
+        await governor._semaphore.acquire()  # the only slot is busy
+        _half_open(governor)
+        task = asyncio.create_task(_consume(governor))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        governor._semaphore.release()
+        assert not governor._probe_in_flight
+        assert await _consume(governor) == ["a", "b"]
+
+    asyncio.run(scenario())
+
+
+def test_half_open_rejects_second_caller_while_probe_runs():
+    async def scenario():
+        governor = _governor()
+        _half_open(governor)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        probe = asyncio.create_task(governor.call(slow))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await governor.call(slow)
+        release.set()
+        assert await probe == "ok"
+        assert governor.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_calls_admitted_before_half_open_do_not_release_the_probe():
+    async def scenario():
+        governor = _governor(max_concurrency=4)
+        release = asyncio.Event()
+        reject = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        async def bad_request():
+            await reject.wait()
+            raise ValueError("bad request")
+
+        # Two calls admitted while the breaker is closed, then it trips and goes half-open
+        stale = asyncio.create_task(governor.call(slow))
+        stale_error = asyncio.create_task(governor.call(bad_request))
+        await asyncio.sleep(0)
+        _half_open(governor)
+        probe = asyncio.create_task(governor.call(slow))
+        await asyncio.sleep(0)
+        assert governor._probe_in_flight
+
+        stale.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await stale
+        reject.set()
+        with pytest.raises(ValueError):
+            await stale_error
+        assert governor._probe_in_flight
+        with pytest.raises(CircuitOpenError):
+            await governor.call(slow)
+
+        release.set()
+        assert await probe == "ok"
+        assert not governor._probe_in_flight
+        assert governor.state == "closed"
+
+    asyncio.run(scenario())
@@ -100,7 +100,10 @@ async function callAPI(endpoint, data, retries = MAX_RETRIES) {
 async function scanTextContent(text) {
     if (!text || text.trim().length < 5) return null;
     
-    const result = await callAPI('/decision/engine', { text });
+    // Platform and region feed the Hate Weather report
+    const platform = location.hostname.replace(/^www\./, '');
+    const region = (navigator.language || '').split('-')[1] || null;
+    const result = await callAPI('/decision/engine', { text, platform, region });
     return result;
 }
 